@@ -0,0 +1,8 @@
+from django.apps import AppConfig
+
+
+class BlocksConfig(AppConfig):
+    name = "blocks"
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,51 @@
+import json
+import os
+import subprocess
+import sys
+
+# Run in a fresh interpreter so imports already made by this process don't hide the cost
+PROBE = """
+import json, resource, sys, time
+import django
+django.setup()
+data = sys.stdin.read()
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+start = time.perf_counter()
+import blocks.templatetags.csv_table_block_tags
+imported = time.perf_counter()
+from blocks.csv_backends import get_csv_backend
+get_csv_backend(sys.argv[1]).parse(data, True)
+parsed = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "parse_ms": (parsed - imported) * 1000,
+    "rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss,
+    "pandas_loaded": "pandas" in sys.modules,
+}))
+"""
+
+def generate_test_csv(rows=1000):
+    lines = ["name,count,price,available"]
+    lines += [f"item {i},{i if i % 10 else ''},{i * 1.25:.2f},{i % 3 == 0}" for i in range(rows)]
+    return "\n".join(lines) + "\n"
+
+def run_probe(backend, data):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(path for path in sys.path if path))
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE, backend], input=data, capture_output=True, text=True, env=env, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def benchmark_csv_backends(rows=1000, repeat=3):
+    """
+    Compare loading the CSV table tag library and parsing one table with each backend, in fresh interpreters.
+    Needs DJANGO_SETTINGS_MODULE set. rss_kb is the growth of peak RSS (Linux reports kB).
+    """
+    data = generate_test_csv(rows)
+    for backend in ("python", "pandas"):
+        runs = [run_probe(backend, data) for _ in range(repeat)]
+        best = min(runs, key=lambda run: run["import_ms"] + run["parse_ms"])
+        print(
+            f"{backend:>7}: import {best['import_ms']:.1f} ms, parse {rows} rows {best['parse_ms']:.1f} ms, "
+            f"peak RSS +{best['rss_kb'] / 1024:.1f} MB, pandas loaded: {best['pandas_loaded']}"
+        )
@@ -2,6 +2,7 @@ from django.utils.translation import gettext_lazy as _
 from wagtail.blocks import CharBlock, StructBlock, RichTextBlock, ListBlock
 
 from .choices import ColourThemeChoiceBlock
+from .render_cache import CachedRenderMixin
 
 
 class CollapsibleCard(StructBlock):
@@ -13,7 +14,10 @@ class CollapsibleCard(StructBlock):
         help_text=_("Body text for this card."),
     )
 
-class CollapsibleCardBlock(StructBlock):
+class CollapsibleCardBlock(CachedRenderMixin, StructBlock):
+    # the template builds element ids from the stream block id
+    render_cache_context = ("block",)
+
     header_colour  = ColourThemeChoiceBlock(
         default='bg-dark',
         label=_("Card Header Background Colour")
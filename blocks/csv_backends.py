@@ -0,0 +1,145 @@
+import csv
+import math
+import re
+from dataclasses import dataclass
+from io import StringIO
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+# Parser used for CSV tables: "python" (stdlib csv, the default), "pandas" or the dotted path of a CSVBackend subclass
+CSV_TABLE_BACKEND = getattr(settings, "CSV_TABLE_BACKEND", "python")
+
+# pandas.read_csv default missing value markers
+NA_VALUES = frozenset({
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+})
+TRUE_VALUES = frozenset({"True", "TRUE", "true"})
+FALSE_VALUES = frozenset({"False", "FALSE", "false"})
+INTEGER = re.compile(r"\s*[+-]?\d+\s*")
+FLOAT = re.compile(r"\s*[+-]?(\d+\.?\d*(e[+-]?\d+)?|\.\d+(e[+-]?\d+)?|inf|infinity)\s*", re.IGNORECASE)
+# integers pandas reads as int64/uint64, larger ones are text
+INTEGER_RANGE = range(-2 ** 63, 2 ** 64)
+
+_backends = {}
+
+
+@dataclass
+class CSVColumn:
+    """A parsed CSV column: header label, inferred kind (string, integer, float or boolean) and values (None = missing)"""
+    name: str
+    kind: str
+    values: list
+
+    @property
+    def is_numeric(self):
+        # anything not a string is right aligned
+        return self.kind != "string"
+
+
+class CSVBackend:
+    """Parses csv text into typed CSVColumns, with the column kinds pandas read_csv + convert_dtypes would infer"""
+    name = None
+
+    def parse(self, data, column_headers):
+        raise NotImplementedError
+
+
+class PythonCSVBackend(CSVBackend):
+    """
+    stdlib csv parser with pure Python type inference, no third party imports.
+    Follows pandas' defaults for missing values, booleans, whole number floats (integer) and header names.
+    """
+    name = "python"
+
+    def parse(self, data, column_headers):
+        rows = [row for row in csv.reader(StringIO(data)) if row]
+        if not rows:
+            raise ValueError("No columns to parse from file")
+        width = len(rows[0])
+        if column_headers:
+            names = self.header_names(rows.pop(0))
+        else:
+            names = [str(index) for index in range(width)]
+        for number, row in enumerate(rows, 2 if column_headers else 1):
+            if len(row) > width:
+                raise ValueError(f"Expected {width} fields in line {number}, saw {len(row)}")
+        cells = [
+            [row[index] if index < len(row) and row[index] not in NA_VALUES else None for row in rows]
+            for index in range(width)
+        ]
+        return [CSVColumn(name, *self.infer_column(values)) for name, values in zip(names, cells)]
+
+    def header_names(self, row):
+        """Header labels, blanks and duplicates named as pandas does"""
+        names = []
+        for index, name in enumerate(row):
+            name = name or f"Unnamed: {index}"
+            candidate, count = name, 0
+            while candidate in names:
+                count += 1
+                candidate = f"{name}.{count}"
+            names.append(candidate)
+        return names
+
+    def infer_column(self, values):
+        """(kind, converted values) of a column of cell text (None = missing)"""
+        present = [value for value in values if value is not None]
+        if present and all(value in TRUE_VALUES or value in FALSE_VALUES for value in present):
+            return "boolean", [None if value is None else value in TRUE_VALUES for value in values]
+        if all(INTEGER.fullmatch(value) for value in present):
+            numbers = [None if value is None else int(value) for value in values]
+            if all(number in INTEGER_RANGE for number in numbers if number is not None):
+                return "integer", numbers
+            return "string", values
+        if all(FLOAT.fullmatch(value) for value in present):
+            numbers = [None if value is None else float(value) for value in values]
+            if all(math.isfinite(number) and number.is_integer() for number in numbers if number is not None):
+                return "integer", [None if number is None else int(number) for number in numbers]
+            return "float", numbers
+        return "string", values
+
+
+class PandasCSVBackend(CSVBackend):
+    """pandas read_csv + convert_dtypes, pandas is only imported when a table is parsed"""
+    name = "pandas"
+
+    def parse(self, data, column_headers):
+        import pandas as pd
+        from pandas.api.types import (is_bool_dtype, is_float_dtype,
+                                      is_integer_dtype)
+        df = read_csv_frame(data, column_headers)
+        columns = []
+        for name in df.columns:
+            series = df[name]
+            if is_bool_dtype(series.dtype):
+                kind = "boolean"
+            elif is_integer_dtype(series.dtype):
+                kind = "integer"
+            elif is_float_dtype(series.dtype):
+                kind = "float"
+            else:
+                kind = "string"
+            values = [
+                None if value is pd.NA or (kind != "string" and pd.isna(value)) else value
+                for value in series.tolist()
+            ]
+            columns.append(CSVColumn(str(name), kind, values))
+        return columns
+
+
+def read_csv_frame(data, column_headers):
+    """Parse csv text with pandas and infer nullable column dtypes"""
+    import pandas as pd
+    df = pd.read_csv(StringIO(data), header=("infer" if column_headers else None))
+    # Note: NaN is considered float by pandas, convert_dtypes re-infers whole number floats with NaN's as Int64
+    return df.convert_dtypes()
+
+def get_csv_backend(name=None):
+    """CSVBackend instance for name (default CSV_TABLE_BACKEND), a backend name or a dotted path"""
+    name = name or CSV_TABLE_BACKEND
+    if name not in _backends:
+        backends = {backend.name: backend for backend in (PythonCSVBackend, PandasCSVBackend)}
+        _backends[name] = (backends[name] if name in backends else import_string(name))()
+    return _backends[name]
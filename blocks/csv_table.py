@@ -1,12 +1,40 @@
+import logging
+
 from django.utils.translation import gettext_lazy as _
-from wagtail.blocks import BooleanBlock, RichTextBlock, StructBlock
+from wagtail.blocks import BooleanBlock, RichTextBlock, StructBlock, StructValue
 from wagtail.blocks.field_block import IntegerBlock
 
 from .choices import TextAlignmentChoiceBlock
+from .csv_tables import (csv_table_text, dump_parsed_columns, is_large_table,
+                         load_parsed_columns, may_be_large_table,
+                         parse_csv_table, prime_csv_table)
 from .heading import HeadingBlock
 from .import_text import ImportTextBlock
+from .render_cache import CachedRenderMixin
+
+class CSVTableValue(StructValue):
+    """
+    CSVTableBlock value holding the parsed table (see blocks.csv_tables) stored alongside the raw csv text.
+    Values saved before the parsed table was stored, or whose data has changed since, are parsed on first access
+    and stored with the next save if the block has store_parsed set.
+    """
+    parsed = None
+
+    def columns(self):
+        columns = load_parsed_columns(self.parsed, self["data"], self["column_headers"])
+        if columns is None:
+            columns = parse_csv_table(self["data"], self["column_headers"])
+            self.parsed = dump_parsed_columns(columns, self["data"], self["column_headers"])
+        return columns
 
-class CSVTableBlock(StructBlock):
+
+class CSVTableBlock(CachedRenderMixin, StructBlock):
+    """
+    store_parsed: save the parsed table (column types and typed cell values) in the stream data
+    so rendering, search indexing and word counts don't have to parse the csv again.
+    Off by default as every revision then holds a second copy of the table, large tables (see is_large_table)
+    are never stored.
+    """
     title = HeadingBlock(required=False, label=_("Table Title"))
     data = ImportTextBlock(
         label=_("Comma Separated Data"),
@@ -52,7 +80,62 @@ class CSVTableBlock(StructBlock):
         help_text=_("Optional: Maximum width (in rem) the table can grow to"),
     )
 
+    def __init__(self, local_blocks=None, store_parsed=False, **kwargs):
+        super().__init__(local_blocks, **kwargs)
+        self.store_parsed = store_parsed
+
     class Meta:
         template = "blocks/csv_table_block.html"
         icon = "table"
         label = "CSV Table"
+        value_class = CSVTableValue
+
+    def clean(self, value):
+        value = super().clean(value)
+        # parse and render the table into the cache so the first page view doesn't pay for it
+        prime_csv_table(value)
+        return value
+
+    def to_python(self, value):
+        struct = super().to_python(value)
+        struct.parsed = value.get("parsed")
+        return struct
+
+    def bulk_to_python(self, values):
+        structs = super().bulk_to_python(values)
+        for struct, value in zip(structs, values):
+            struct.parsed = value.get("parsed")
+        return structs
+
+    def get_prep_value(self, value):
+        prep = super().get_prep_value(value)
+        if self.store_parsed and isinstance(value, CSVTableValue):
+            try:
+                if not is_large_table(value.columns()):
+                    prep["parsed"] = value.parsed
+            except Exception as e:
+                # unparseable data is saved without the parsed table
+                logging.error(
+                    f"{type(e).__name__} at line {e.__traceback__.tb_lineno} of {__file__}: {e}"
+                )
+        return prep
+
+    def is_render_cacheable(self, value):
+        # large tables re-cache their rows for csv_table_rows when rendered, see render_csv_table
+        # decided from the line count, parsing here would parse every table on every render, cached or not
+        return not may_be_large_table(value["data"] or "")
+
+    def get_searchable_content(self, value):
+        if not self.search_index:
+            return []
+        content = []
+        for name, block in self.child_blocks.items():
+            if name == "data":
+                # index the cell text rather than the raw csv
+                try:
+                    content.append(csv_table_text(value))
+                    continue
+                except Exception:
+                    pass
+            content.extend(block.get_searchable_content(value.get(name, block.get_default())))
+        return content
@@ -0,0 +1,370 @@
+import json
+import logging
+import math
+import re
+import threading
+from collections import OrderedDict
+from hashlib import sha1
+
+from django.conf import settings
+from django.core.cache import cache
+from django.templatetags.static import static
+from django.urls import reverse
+from wagtail.models import Page
+
+from .csv_backends import CSVColumn, get_csv_backend, read_csv_frame
+
+# Seconds rendered tables are cached for, the key is a hash of the table data and options so edits never go stale
+CSV_TABLE_CACHE_TIMEOUT = getattr(settings, "CSV_TABLE_CACHE_TIMEOUT", 60 * 60 * 24 * 7)
+# Render with the pandas Styler instead of writing the html directly (slow for large tables, imports pandas)
+CSV_TABLE_USE_STYLER = getattr(settings, "CSV_TABLE_USE_STYLER", False)
+# Tables with more rows than this render the first CSV_TABLE_WINDOW_ROWS rows, the rest are fetched from csv_table_rows
+CSV_TABLE_LARGE_ROWS = getattr(settings, "CSV_TABLE_LARGE_ROWS", 1000)
+CSV_TABLE_WINDOW_ROWS = getattr(settings, "CSV_TABLE_WINDOW_ROWS", 200)
+# Largest row window csv_table_rows will serve in one response
+CSV_TABLE_MAX_WINDOW_ROWS = getattr(settings, "CSV_TABLE_MAX_WINDOW_ROWS", 5000)
+# Formatted rows of large tables are cached in chunks of this many rows, keeping items under memcached's 1MB limit
+CSV_TABLE_ROWS_CHUNK = getattr(settings, "CSV_TABLE_ROWS_CHUNK", 1000)
+# Pages whose table keys are held in process, so csv_table_rows turns away unknown keys without loading the page
+CSV_TABLE_PAGE_KEYS_CACHE_SIZE = getattr(settings, "CSV_TABLE_PAGE_KEYS_CACHE_SIZE", 256)
+# csv_table_key values are sha1 hex digests
+CSV_TABLE_KEY = re.compile(r"[0-9a-f]{40}")
+
+# Bumped when the stored parsed representation changes, older representations are re-parsed on access
+CSV_PARSED_FORMAT = 1
+
+_page_table_keys = OrderedDict()
+_lock = threading.Lock()
+
+RIGHT_ALIGN = "text-align: right; padding-right: 0.7rem;"
+ROW_HEADER = "font-weight: bold; border-right-width: 0.1rem; border-right-color: var(--bs-dark);"
+
+
+def csv_table_key(table_block):
+    """Hash of the table data and the options that change the rendered table"""
+    options = (
+        table_block["data"],
+        table_block["precision"],
+        bool(table_block["column_headers"]),
+        bool(table_block["row_headers"]),
+        bool(table_block["compact"]),
+    )
+    return sha1(repr(options).encode()).hexdigest()
+
+def parse_csv_table(data, column_headers):
+    """Parse csv text into a list of typed CSVColumns with the configured backend (see blocks.csv_backends)"""
+    return get_csv_backend().parse(data, column_headers)
+
+def csv_source_key(data, column_headers):
+    """Hash of the inputs to parse_csv_table, stored with the parsed columns to detect stale representations"""
+    return sha1(repr((data, bool(column_headers))).encode()).hexdigest()
+
+def dump_parsed_columns(columns, data, column_headers):
+    """
+    Compact, JSON serialisable form of parsed columns to store with the block value.
+    Each column keeps its kind and native values, None marks a missing cell.
+    Non-finite floats are stored as text ("inf", "-inf", "nan"), JSON has no literal for them and jsonb rejects
+    the Infinity/NaN tokens json.dumps writes.
+    """
+    return {
+        "format": CSV_PARSED_FORMAT,
+        "key": csv_source_key(data, column_headers),
+        "columns": [
+            [column.name, column.kind, dump_float_values(column.values) if column.kind == "float" else column.values]
+            for column in columns
+        ],
+    }
+
+def dump_float_values(values):
+    return [str(value) if value is not None and not math.isfinite(value) else value for value in values]
+
+def load_float_values(values):
+    return [float(value) if isinstance(value, str) else value for value in values]
+
+def load_parsed_columns(parsed, data, column_headers):
+    """CSVColumns from a stored parsed representation, None if missing or not parsed from this data"""
+    if not isinstance(parsed, dict) or parsed.get("format") != CSV_PARSED_FORMAT:
+        return None
+    if parsed.get("key") != csv_source_key(data, column_headers):
+        return None
+    return [
+        CSVColumn(name, kind, load_float_values(values) if kind == "float" else values)
+        for name, kind, values in parsed["columns"]
+    ]
+
+def get_csv_columns(table_block):
+    """Parsed columns of a table value, from its stored representation where there is one"""
+    if hasattr(table_block, "columns"):
+        return table_block.columns()
+    return parse_csv_table(table_block["data"], table_block["column_headers"])
+
+def format_cell(value, kind, precision):
+    if value is None:
+        return ""
+    if kind == "float":
+        return f"{value:.{precision}f}"
+    return str(value)
+
+def csv_table_text(table_block):
+    """Header and cell text of a table (as rendered) separated by spaces, for search and word counts"""
+    precision = table_block["precision"]
+    columns = get_csv_columns(table_block)
+    words = [column.name for column in columns] if table_block["column_headers"] else []
+    for column in columns:
+        words.extend(format_cell(value, column.kind, precision) for value in column.values if value is not None)
+    return " ".join(words)
+
+def format_rows(columns, precision, start=0, stop=None):
+    """Formatted cell text of rows start:stop, one tuple per row"""
+    return zip(*[
+        [format_cell(value, column.kind, precision) for value in column.values[start:stop]] for column in columns
+    ])
+
+def table_classes(table_block):
+    return f'table table-striped table-hover mb-0{" table-sm" if table_block["compact"] else ""}'
+
+def write_html_table(columns, table_block, table_id, row_count=None):
+    """
+    Write the html table for parsed columns directly, without the pandas Styler.
+    Same table classes, cell classes and alignment rules as the Styler rendering, with the styles set per column.
+    Cell values are not escaped, as with the Styler. row_count limits the table to the first rows.
+    """
+    precision = table_block["precision"]
+    selector = f"#T_{table_id}"
+    styles = []
+    numeric = [f"{selector} td.col{index}" for index, column in enumerate(columns) if column.is_numeric]
+    if table_block["column_headers"]:
+        numeric += [f"{selector} th.col{index}" for index, column in enumerate(columns) if column.is_numeric]
+    if numeric:
+        styles.append(f"{', '.join(numeric)} {{{RIGHT_ALIGN}}}")
+    if table_block["row_headers"] and columns:
+        styles.append(f"{selector} td.col0 {{{ROW_HEADER}}}")
+
+    html = [f'<style type="text/css">\n{chr(10).join(styles)}\n</style>\n']
+    html.append(f'<table id="T_{table_id}" class="{table_classes(table_block)}">\n<thead>\n')
+    if table_block["column_headers"]:
+        html.append("<tr>")
+        html.extend(
+            f'<th class="col_heading level0 col{index}">{column.name}</th>' for index, column in enumerate(columns)
+        )
+        html.append("</tr>\n")
+    html.append("</thead>\n<tbody>\n")
+
+    for row, cells in enumerate(format_rows(columns, precision, 0, row_count)):
+        html.append("<tr>")
+        html.extend(f'<td class="data row{row} col{index}">{cell}</td>' for index, cell in enumerate(cells))
+        html.append("</tr>\n")
+    html.append("</tbody>\n</table>\n")
+    return "".join(html)
+
+def render_styler_table(table_block):
+    """Render the table with the pandas Styler"""
+    df = read_csv_frame(table_block["data"], table_block["column_headers"])
+    # Hide row numbers (index)
+    dfs = df.style.hide()
+    # Set missing values representation as empty string
+    dfs = dfs.format(na_rep="")
+    # Set decimal places for float. Redeclare na values for floats as format is not cumulative, it is replaced.
+    dfs = dfs.format(
+        subset=list(df.select_dtypes(include="Float64")),
+        precision=table_block["precision"],
+        na_rep="",
+    )
+    # Align everything not an object (object=string) to the right
+    dfs = dfs.set_properties(
+        subset=list(df.select_dtypes(exclude=["string", "object"])),
+        **{"text-align": "right", "padding-right": "0.7rem"},
+    )
+    if table_block["column_headers"]:
+        # Set non-object column headers to right aligned
+        for column in list(df.select_dtypes(exclude=["string", "object"])):
+            dfs = dfs.set_table_styles(
+                {
+                    column: [
+                        {
+                            "selector": "th",
+                            "props": [("text-align", "right"), ("padding-right", "0.7rem")],
+                        }
+                    ]
+                },
+                overwrite=False,
+            )
+    else:
+        # hide column index row
+        dfs = dfs.hide(axis=1)
+    # If row headers, set formatting on 1st column (don't set to index, error thrown if not unique values)
+    if table_block["row_headers"]:
+        dfs = dfs.set_properties(
+            subset=df.columns[[0]],
+            **{
+                "font-weight": "bold",
+                "border-right-width": "0.1rem",
+                "border-right-color": "var(--bs-dark)",
+            },
+        )
+    # Add table classes and styles
+    dfs = dfs.set_table_attributes(f'class="{table_classes(table_block)}"')
+    return dfs.to_html()
+
+def csv_rows_cache_key(key, chunk=None):
+    return f"blocks.csv_table.rows.{key}" if chunk is None else f"blocks.csv_table.rows.{key}.{chunk}"
+
+def get_csv_table_rows(key, start, count):
+    """(total, formatted rows start:start+count) of a large table from the cache, None if any part isn't cached"""
+    total = cache.get(csv_rows_cache_key(key))
+    if total is None:
+        return None
+    stop = min(start + count, total)
+    if start >= stop:
+        return total, []
+    first, last = start // CSV_TABLE_ROWS_CHUNK, (stop - 1) // CSV_TABLE_ROWS_CHUNK
+    keys = [csv_rows_cache_key(key, chunk) for chunk in range(first, last + 1)]
+    chunks = cache.get_many(keys)
+    if len(chunks) < len(keys):
+        return None
+    rows = [row for chunk_key in keys for row in chunks[chunk_key]]
+    offset = first * CSV_TABLE_ROWS_CHUNK
+    return total, rows[start - offset:stop - offset]
+
+def page_csv_tables(page):
+    """{csv_table_key: CSVTableValue} of the tables in a specific page's StreamFields, from their raw data"""
+    from core.content_index import page_streamfields
+    from core.utils import walk_streamfield
+
+    from .csv_table import CSVTableBlock
+
+    tables = {}
+    for field_name, value in page_streamfields(page):
+        for node in walk_streamfield(value):
+            if isinstance(node.block, CSVTableBlock) and isinstance(node.raw, dict):
+                table_block = node.block.to_python(node.raw)
+                tables[csv_table_key(table_block)] = table_block
+    return tables
+
+def find_csv_table(key, page_id):
+    """
+    CSVTableValue of the table with csv_table_key key on live page page_id, None if there isn't one.
+    For the row endpoint when a table's rows are not in the cache (another worker rendered it, or they were evicted).
+    The keys found on a page are held in process until it is published again, so unknown keys cost one query.
+    """
+    published = Page.objects.live().filter(pk=page_id).values_list("last_published_at", flat=True)
+    if not published:
+        return None
+    published = published[0]
+    with _lock:
+        keys = _page_table_keys.get(page_id)
+        if keys and keys[0] == published:
+            _page_table_keys.move_to_end(page_id)
+            if key not in keys[1]:
+                return None
+
+    page = Page.objects.get(pk=page_id).specific
+    tables = page_csv_tables(page)
+    with _lock:
+        _page_table_keys[page_id] = (published, frozenset(tables))
+        _page_table_keys.move_to_end(page_id)
+        while len(_page_table_keys) > CSV_TABLE_PAGE_KEYS_CACHE_SIZE:
+            _page_table_keys.popitem(last=False)
+    return tables.get(key)
+
+def load_csv_table_rows(key, page_id, start, count):
+    """
+    (total, formatted rows start:start+count) of a large table, None if the table can't be found.
+    Rows are read from the cache, or parsed again from the table's page and re-cached when missing.
+    """
+    rows = get_csv_table_rows(key, start, count)
+    if rows is None:
+        table_block = find_csv_table(key, page_id)
+        if table_block is None:
+            return None
+        cache_large_table_rows(key, get_csv_columns(table_block), table_block)
+        rows = get_csv_table_rows(key, start, count)
+    return rows
+
+def iter_rows_json(start, total, rows):
+    """JSON document of a window of formatted rows of a large table, in chunks for streaming"""
+    yield f'{{"start": {start}, "total": {total}, "rows": ['
+    for index, cells in enumerate(rows):
+        yield f'{"," if index else ""}{json.dumps(cells)}'
+    yield "]}"
+
+def write_large_table_controls(key, total, page_id=None):
+    """
+    Button and script loading the rows following the first CSV_TABLE_WINDOW_ROWS of a large table.
+    page_id is the page the table is on, for csv_table_rows to reload it from when the rows aren't cached (0 if none).
+    """
+    url = reverse("csv_table_rows", args=[page_id or 0, key])
+    return (
+        f'<div class="csv-table-more text-center my-2" data-csv-rows-url="{url}" data-csv-table="T_{key[:5]}" '
+        f'data-loaded="{CSV_TABLE_WINDOW_ROWS}" data-total="{total}" data-window="{CSV_TABLE_WINDOW_ROWS}">\n'
+        f'<button type="button" class="btn btn-sm btn-outline-secondary">'
+        f'Show more rows ({CSV_TABLE_WINDOW_ROWS} of {total} shown)</button>\n</div>\n'
+        f'<script src="{static("js/csv-table-block.js")}" defer></script>\n'
+    )
+
+def may_be_large_table(data):
+    """
+    True if csv text has enough lines to parse into a large table, without parsing it.
+    Counts lines rather than rows, so quoted newlines can only err towards large.
+    """
+    return bool(CSV_TABLE_LARGE_ROWS) and data.count("\n") > CSV_TABLE_LARGE_ROWS
+
+def is_large_table(columns):
+    """True if the table is rendered a window of rows at a time"""
+    return bool(CSV_TABLE_LARGE_ROWS) and bool(columns) and len(columns[0].values) > CSV_TABLE_LARGE_ROWS
+
+def cache_large_table_rows(key, columns, table_block):
+    """Cache the row count and formatted rows of a large table, CSV_TABLE_ROWS_CHUNK rows per cache item"""
+    total = len(columns[0].values) if columns else 0
+    precision = table_block["precision"]
+    rows = {
+        csv_rows_cache_key(key, chunk): list(format_rows(columns, precision, start, start + CSV_TABLE_ROWS_CHUNK))
+        for chunk, start in enumerate(range(0, total, CSV_TABLE_ROWS_CHUNK))
+    }
+    cache.set_many(rows, CSV_TABLE_CACHE_TIMEOUT)
+    # the count goes last, a reader that finds it can expect the chunks to be there
+    cache.set(csv_rows_cache_key(key), total, CSV_TABLE_CACHE_TIMEOUT)
+
+def render_csv_table(table_block, page_id=None):
+    """
+    Return the html table for a CSVTableBlock value, cached by a hash of the data and table options.
+    Tables over CSV_TABLE_LARGE_ROWS rows render the first CSV_TABLE_WINDOW_ROWS rows only, their formatted rows
+    are cached in chunks under the same hash for the csv_table_rows view to serve the following rows.
+    The controls loading those rows name page_id, they are added after the cache so tables are shared between pages.
+    """
+    key = csv_table_key(table_block)
+    cache_key = f"blocks.csv_table.html.{key}"
+    cached = cache.get(cache_key)
+    if cached is not None:
+        html, total = cached
+        large = total is not None
+        # the rows may have been evicted separately from the html
+        if large and not cache.has_key(csv_rows_cache_key(key)):
+            cache_large_table_rows(key, get_csv_columns(table_block), table_block)
+    else:
+        columns = None
+        if not CSV_TABLE_USE_STYLER or may_be_large_table(table_block["data"]):
+            # the Styler parses for itself, only parse ahead of it when the table could be large
+            columns = get_csv_columns(table_block)
+        large = is_large_table(columns)
+        total = len(columns[0].values) if large else None
+        if large:
+            cache_large_table_rows(key, columns, table_block)
+            html = write_html_table(columns, table_block, key[:5], CSV_TABLE_WINDOW_ROWS)
+        elif CSV_TABLE_USE_STYLER:
+            html = render_styler_table(table_block)
+        else:
+            html = write_html_table(columns, table_block, key[:5])
+        cache.set(cache_key, (html, total), CSV_TABLE_CACHE_TIMEOUT)
+    if large:
+        html += write_large_table_controls(key, total, page_id)
+    return html
+
+def prime_csv_table(table_block):
+    """Render a table into the cache ahead of the first page view, errors are logged and left to the render"""
+    try:
+        render_csv_table(table_block)
+    except Exception as e:
+        logging.error(
+            f"{type(e).__name__} at line {e.__traceback__.tb_lineno} of {__file__}: {e}"
+        )
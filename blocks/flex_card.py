@@ -11,10 +11,11 @@ from .choices import (BreakpointChoiceBlock, ColourThemeChoiceBlock,
                       FlexCardLayoutChoiceBlock)
 from .seo_image_chooser import SEOImageChooserBlock
 from .links import LinkBlock
+from .render_cache import CachedRenderMixin
 from .rich_text import SimpleRichTextBlock
 
 
-class FlexCardBlock(StructBlock):
+class FlexCardBlock(CachedRenderMixin, StructBlock):
     
     text = SimpleRichTextBlock(
         label=_("Card Body Text"),
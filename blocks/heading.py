@@ -6,9 +6,10 @@ from wagtail.blocks import CharBlock, StructBlock
 from wagtail.blocks.struct_block import StructBlockValidationError
 
 from .choices import HeadingSizeChoiceBlock, TextAlignmentChoiceBlock
+from .render_cache import CachedRenderMixin
 
 
-class HeadingBlock(StructBlock):
+class HeadingBlock(CachedRenderMixin, StructBlock):
     title = CharBlock(required=True)
     heading_size = HeadingSizeChoiceBlock(default='h2')
     alignment = TextAlignmentChoiceBlock(default='start')
@@ -7,8 +7,9 @@ from django.forms import RadioSelect
 from django.forms.utils import ErrorList
 from django.utils.functional import cached_property
 from django.utils.translation import gettext_lazy as _
-from wagtail.blocks import (CharBlock, ChoiceBlock, StaticBlock, StructBlock,
-                            StructValue)
+from wagtail.blocks import (CharBlock, ChoiceBlock, StaticBlock, StreamValue,
+                            StructBlock, StructValue)
+from wagtail.blocks.list_block import ListValue
 from wagtail.blocks.struct_block import (StructBlockAdapter,
                                          StructBlockValidationError)
 from wagtail.telepath import register
@@ -65,8 +66,15 @@ class LinkValue(StructValue):
     """
     i18n_enabled = getattr(settings, "WAGTAIL_I18N_ENABLED", False)
 
+    def set_resolved(self, url, text=None):
+        """Store a url (and default link text) resolved in bulk by resolve_links, url() and text() will return these"""
+        self._resolved_url = url
+        self._resolved_text = text
+
     def url(self) -> str:
         """Return a link's url regardless of link type"""
+        if hasattr(self, '_resolved_url'):
+            return self._resolved_url
         try:
             match self.get("link_type"):
                 case 'page':
@@ -81,18 +89,8 @@ class LinkValue(StructValue):
                 case 'document':
                     return self.get("document").url
                 case 'product':
-                    from product.models import Product, ProductPage
-                    base_page = ProductPage.objects.first()
-                    sku = self.get('product').sku
-                    product = Product.objects.filter(sku=sku).first()
-                    if product and base_page:
-                        if self.i18n_enabled:
-                            product = product.localized
-                            base_page = base_page.localized
-                        product_url_part = base_page.reverse_subpage(
-                            name='product_detail', kwargs={'sku': product.sku})
-                        return f"{base_page.url}{product_url_part}"
-                    return ''
+                    from product.registry import get_product_registry
+                    return get_product_registry().url(self.get('product').sku)
         except Exception as e:
             logging.error(
                 f"{type(e).__name__} at line {e.__traceback__.tb_lineno} of {__file__}: {e}"
@@ -104,6 +102,8 @@ class LinkValue(StructValue):
         link_text = self.get("link_text")
         if link_text:
             return link_text
+        elif getattr(self, '_resolved_text', None) is not None:
+            return self._resolved_text
         else:
             try:
                 match self.get("link_type"):
@@ -123,6 +123,78 @@ class LinkValue(StructValue):
             return ''
 
 
+def iter_link_values(value):
+    """Yield every LinkValue in a block value (StreamValue, StructValue or list), including nested blocks"""
+    if isinstance(value, LinkValue):
+        yield value
+    elif isinstance(value, StreamValue):
+        for child in value:
+            yield from iter_link_values(child.value)
+    elif isinstance(value, StructValue):
+        for child in value.values():
+            yield from iter_link_values(child)
+    elif isinstance(value, (list, ListValue)):
+        for child in value:
+            yield from iter_link_values(getattr(child, 'value', child))
+
+
+def resolve_links(value):
+    """
+    Resolve the url and default text of every LinkValue in a StreamField value in bulk, before rendering.
+    Localized pages are fetched with one query rather than per link, product urls come from the product url registry.
+    Returns the value.
+    """
+    links = [link for link in iter_link_values(value) if not hasattr(link, '_resolved_url')]
+    if not links:
+        return value
+    i18n_enabled = LinkValue.i18n_enabled
+    try:
+        from wagtail.models import Page
+        from core.locales import get_active_locale
+        locale_id = get_active_locale().pk if i18n_enabled else None
+
+        # pages - live translations in the active locale, falling back to the linked page as page.localized does
+        pages = [link.get('page') for link in links if link.get('link_type') == 'page' and link.get('page')]
+        localized_pages = {}
+        if pages and i18n_enabled:
+            localized_pages = {
+                page.translation_key: page
+                for page in Page.objects.live().filter(
+                    translation_key__in={page.translation_key for page in pages}, locale_id=locale_id
+                )
+            }
+
+        # products - detail urls from the product url registry
+        product_registry = None
+        if any(link.get('link_type') == 'product' and link.get('product') for link in links):
+            from product.registry import get_product_registry
+            product_registry = get_product_registry()
+    except Exception as e:
+        logging.error(
+            f"{type(e).__name__} at line {e.__traceback__.tb_lineno} of {__file__}: {e}"
+        )
+        return value
+
+    for link in links:
+        try:
+            match link.get('link_type'):
+                case 'page':
+                    page = link.get('page')
+                    if page:
+                        page = localized_pages.get(page.translation_key, page)
+                        link.set_resolved(page.url + (link.get('anchor_target') or ''), page.title)
+                case 'product':
+                    product = link.get('product')
+                    if product:
+                        link.set_resolved(product_registry.url(product.sku), product.title)
+        except Exception as e:
+            # leave the link to resolve itself
+            logging.error(
+                f"{type(e).__name__} at line {e.__traceback__.tb_lineno} of {__file__}: {e}"
+            )
+    return value
+
+
 class LinkBlock(StructBlock):
     def __init__(
         self,
@@ -0,0 +1,137 @@
+import json
+import logging
+import threading
+from collections import OrderedDict
+from hashlib import sha1
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.serializers.json import DjangoJSONEncoder
+from django.template.loader import get_template
+from django.utils import translation
+from django.utils.safestring import mark_safe
+
+# Maximum number of rendered blocks held in process, least recently used blocks are evicted first
+BLOCK_RENDER_CACHE_SIZE = getattr(settings, "BLOCK_RENDER_CACHE_SIZE", 512)
+# Rendered blocks larger than this (characters) are not cached
+BLOCK_RENDER_CACHE_MAX_SIZE = getattr(settings, "BLOCK_RENDER_CACHE_MAX_SIZE", 256 * 1024)
+# Optional CACHES alias rendered blocks are shared through, None keeps them in process only
+BLOCK_RENDER_CACHE = getattr(settings, "BLOCK_RENDER_CACHE", None)
+BLOCK_RENDER_CACHE_TIMEOUT = getattr(settings, "BLOCK_RENDER_CACHE_TIMEOUT", 60 * 60 * 24)
+# Version shared between processes, replaced when content blocks render (pages, images, documents, products) changes
+BLOCK_RENDER_VERSION_KEY = "blocks.render.version"
+
+_renders = OrderedDict()
+_lock = threading.Lock()
+_template_versions = {}
+_version = None
+# per-thread flag, cleared at the start of each request so the shared version is checked once per request
+_request_state = threading.local()
+
+
+def block_render_version():
+    """Shared render cache version, checked once per request (see start_block_render_request)"""
+    global _version
+    if _version is None or not getattr(_request_state, "checked", True):
+        _request_state.checked = True
+        version = cache.get_or_set(BLOCK_RENDER_VERSION_KEY, lambda: uuid4().hex, None)
+        if version != _version:
+            with _lock:
+                _renders.clear()
+            _version = version
+    return _version
+
+def invalidate_block_renders():
+    """Drop rendered blocks in this and (via the shared version) every other process"""
+    global _version
+    with _lock:
+        _renders.clear()
+    _version = uuid4().hex
+    cache.set(BLOCK_RENDER_VERSION_KEY, _version, None)
+
+def start_block_render_request():
+    """Have the next render in this thread check the shared version, called on request_started"""
+    _request_state.checked = False
+
+def template_version(template_name):
+    """Hash of a block template's source, so edited templates don't serve stale renders from a shared cache"""
+    if template_name not in _template_versions:
+        try:
+            source = get_template(template_name).template.source
+        except Exception:
+            source = ""
+        _template_versions[template_name] = sha1(source.encode()).hexdigest()[:12]
+    return _template_versions[template_name]
+
+def strip_block_ids(prep):
+    """Prepped value without the ids of list/stream children, which are regenerated when missing from stored data"""
+    if isinstance(prep, list):
+        return [strip_block_ids(item) for item in prep]
+    if isinstance(prep, dict):
+        is_child = "type" in prep and "value" in prep
+        return {key: strip_block_ids(item) for key, item in prep.items() if not (is_child and key == "id")}
+    return prep
+
+def block_render_key(block, value, context=None):
+    """Key of a block render: block class, value hash, language, template version and the context it reads"""
+    prep = json.dumps(strip_block_ids(block.get_prep_value(value)), sort_keys=True, cls=DjangoJSONEncoder)
+    context_values = [
+        str(getattr(context.get(name), "id", context.get(name))) if context else None
+        for name in block.render_cache_context
+    ]
+    parts = (
+        f"{type(block).__module__}.{type(block).__qualname__}",
+        template_version(getattr(block.meta, "template", None) or ""),
+        translation.get_language(),
+        *context_values,
+        prep,
+    )
+    return sha1(repr(parts).encode()).hexdigest()
+
+def get_shared_cache():
+    return caches[BLOCK_RENDER_CACHE] if BLOCK_RENDER_CACHE else None
+
+
+class CachedRenderMixin:
+    """
+    Caches a block's rendered output, keyed by block_render_key.
+    Renders are held in an in-process LRU and, if BLOCK_RENDER_CACHE names a cache, shared through it.
+    render_cache_context lists the parent context variables the template reads (their id is used if they have one),
+    blocks whose output depends on anything else the value doesn't capture should not use this mixin.
+    """
+    render_cache_context = ()
+
+    def is_render_cacheable(self, value):
+        return True
+
+    def render(self, value, context=None):
+        try:
+            key = None
+            if self.is_render_cacheable(value):
+                key = f"blocks.render.{block_render_version()}.{block_render_key(self, value, context)}"
+        except Exception as e:
+            logging.error(
+                f"{type(e).__name__} at line {e.__traceback__.tb_lineno} of {__file__}: {e}"
+            )
+        if key is None:
+            return super().render(value, context)
+
+        with _lock:
+            if key in _renders:
+                _renders.move_to_end(key)
+                return _renders[key]
+        shared = get_shared_cache()
+        html = shared.get(key) if shared else None
+        if html is None:
+            html = super().render(value, context)
+            if len(html) > BLOCK_RENDER_CACHE_MAX_SIZE:
+                return html
+            if shared:
+                shared.set(key, str(html), BLOCK_RENDER_CACHE_TIMEOUT)
+        html = mark_safe(html)
+        with _lock:
+            _renders[key] = html
+            while len(_renders) > BLOCK_RENDER_CACHE_SIZE:
+                _renders.popitem(last=False)
+        return html
@@ -2,9 +2,10 @@ from django.utils.translation import gettext_lazy as _
 from wagtail.blocks import RichTextBlock, StructBlock
 
 from .choices import TextAlignmentChoiceBlock
+from .render_cache import CachedRenderMixin
 
 
-class RichTextStructBlock(StructBlock):
+class RichTextStructBlock(CachedRenderMixin, StructBlock):
     alignment = TextAlignmentChoiceBlock(default="justify", label=_("Text Alignment"))
     content = RichTextBlock()
 
@@ -0,0 +1,35 @@
+from django.core.signals import request_started
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from wagtail.documents import get_document_model
+from wagtail.images import get_image_model
+from wagtail.models import Page
+from wagtail.signals import page_published, page_unpublished, post_page_move
+
+from product.models import Product
+
+from .render_cache import invalidate_block_renders, start_block_render_request
+
+
+@receiver(page_published)
+@receiver(page_unpublished)
+@receiver(post_page_move)
+@receiver(post_delete, sender=Page)
+def clear_block_renders_page(sender, instance, **kwargs):
+    # rendered links and rich text hold page urls and titles
+    invalidate_block_renders()
+
+
+@receiver(post_save, sender=get_image_model())
+@receiver(post_delete, sender=get_image_model())
+@receiver(post_save, sender=get_document_model())
+@receiver(post_delete, sender=get_document_model())
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def clear_block_renders(sender, instance, **kwargs):
+    invalidate_block_renders()
+
+
+@receiver(request_started)
+def check_block_render_version(sender, **kwargs):
+    start_block_render_request()
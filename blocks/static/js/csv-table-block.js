@@ -0,0 +1,54 @@
+// js/csv-table-block.js
+// Load the remaining rows of large CSV tables (see blocks.csv_tables) a window at a time
+
+document.addEventListener("DOMContentLoaded", () => {
+    document.querySelectorAll("[data-csv-rows-url]").forEach(container => {
+        if (container.dataset.ready) return;
+        container.dataset.ready = "true";
+        const table = document.getElementById(container.dataset.csvTable);
+        const button = container.querySelector("button");
+        const total = parseInt(container.dataset.total);
+        const windowSize = parseInt(container.dataset.window);
+
+        const loadRows = async () => {
+            const loaded = parseInt(container.dataset.loaded);
+            button.disabled = true;
+            try {
+                const response = await fetch(
+                    `${container.dataset.csvRowsUrl}?start=${loaded}&count=${windowSize}`
+                );
+                const data = await response.json();
+                if (data.error) {
+                    button.textContent = data.error;
+                    return;
+                }
+                const tbody = table.querySelector("tbody");
+                const fragment = document.createDocumentFragment();
+                data.rows.forEach((cells, index) => {
+                    const row = document.createElement("tr");
+                    cells.forEach((cell, column) => {
+                        // same classes as the server rendered rows so the column styles apply
+                        const td = document.createElement("td");
+                        td.className = `data row${data.start + index} col${column}`;
+                        td.innerHTML = cell;
+                        row.appendChild(td);
+                    });
+                    fragment.appendChild(row);
+                });
+                tbody.appendChild(fragment);
+                const shown = data.start + data.rows.length;
+                container.dataset.loaded = shown;
+                if (shown >= total) {
+                    container.remove();
+                } else {
+                    button.textContent = `Show more rows (${shown} of ${total} shown)`;
+                    button.disabled = false;
+                }
+            } catch (error) {
+                console.error(error);
+                button.disabled = false;
+            }
+        };
+        button.addEventListener("click", loadRows);
+    });
+});
@@ -1,7 +1,8 @@
 import logging
 from django import template
 from django.utils.translation import get_language
-from wagtail.models import Locale
+
+from core.locales import get_default_locale
 
 register = template.Library()
 
@@ -25,7 +26,7 @@ def translated_text(context, field_name='text'):
             )
         # If still not found, try default locale
         if not match:
-            default_lang = Locale.get_default().language_code
+            default_lang = get_default_locale().language_code
             match = next(
                 (item for item in items if item.value.get("language", "") == default_lang),
                 None
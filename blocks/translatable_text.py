@@ -6,10 +6,13 @@ from django.utils.translation import gettext_lazy as _
 from wagtail.blocks import (CharBlock, ChoiceBlock, ListBlock,
                             ListBlockValidationError, StructBlock)
 from wagtail.blocks.struct_block import StructBlockAdapter
-from wagtail.models import Locale
 from wagtail.telepath import register
 
-get_default_language_code = lazy(lambda: Locale.get_default().language_code, str)
+from core.locales import get_default_locale
+
+from .render_cache import CachedRenderMixin
+
+get_default_language_code = lazy(lambda: get_default_locale().language_code, str)
 
 
 class TranslatableTextBlock(StructBlock):
@@ -55,14 +58,14 @@ class TranslatableTextBlock(StructBlock):
 # register(TranslatableTextBlockAdapter(), TranslatableTextBlock)
 
 
-class TranslatableTextListBlock(ListBlock):
+class TranslatableTextListBlock(CachedRenderMixin, ListBlock):
     def __init__(self, **kwargs):
         super().__init__(TranslatableTextBlock(), **kwargs)
 
     def clean(self, value):
         cleaned_value = super().clean(value)  
 
-        default_locale = Locale.get_default()
+        default_locale = get_default_locale()
         seen_langs = set()
         has_default = False
         block_errors = {}
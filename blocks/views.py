@@ -4,9 +4,15 @@ from urllib.parse import urlparse, urlsplit
 import requests
 import validators
 from bs4 import BeautifulSoup
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence
 from django.views import View
 
+from .csv_tables import (CSV_TABLE_KEY, CSV_TABLE_MAX_WINDOW_ROWS,
+                         CSV_TABLE_WINDOW_ROWS, iter_rows_json,
+                         load_csv_table_rows)
+
 
 class ExternalContentProxy(View):
     def get(self, request):
@@ -135,3 +141,33 @@ def check_image_url(request):
             return JsonResponse({"valid": False})
     except requests.RequestException:
         return JsonResponse({"valid": False})
+
+
+def csv_table_rows(request, page_id, key):
+    """
+    Serve a window of rows (start, count) of a large CSV table as JSON, streamed and gzipped if accepted.
+    Rows come from the cache filled when the table was rendered, the key is the hash in the table html.
+    On a miss (another worker rendered the table, or it was evicted) the table is reloaded from live page page_id
+    and parsed again, tables not on a published page (eg previews) need the rows to be in a shared cache.
+    """
+    if not CSV_TABLE_KEY.fullmatch(key):
+        return JsonResponse({"error": "Invalid table"}, status=400)
+    try:
+        start = max(int(request.GET.get("start", 0)), 0)
+        count = min(max(int(request.GET.get("count", CSV_TABLE_WINDOW_ROWS)), 1), CSV_TABLE_MAX_WINDOW_ROWS)
+    except ValueError:
+        return JsonResponse({"error": "Invalid row window"}, status=400)
+    rows = load_csv_table_rows(key, page_id, start, count)
+    if rows is None:
+        # 410 rather than 404, LocaleMiddleware redirects 404s to the language prefixed url
+        return JsonResponse({"error": "Table no longer available, reload the page"}, status=410)
+
+    total, rows = rows
+    chunks = (chunk.encode() for chunk in iter_rows_json(start, total, rows))
+    if "gzip" in request.headers.get("Accept-Encoding", ""):
+        response = StreamingHttpResponse(compress_sequence(chunks), content_type="application/json")
+        response.headers["Content-Encoding"] = "gzip"
+    else:
+        response = StreamingHttpResponse(chunks, content_type="application/json")
+    patch_vary_headers(response, ("Accept-Encoding",))
+    return response
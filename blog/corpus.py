@@ -0,0 +1,37 @@
+import json
+from hashlib import sha1
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from core.utils import count_words, get_html_text
+
+
+def block_hash(raw_block):
+    """Hash of a raw stream block's type and value (not its id, so reordered blocks still match)"""
+    return sha1(
+        json.dumps([raw_block["type"], raw_block["value"]], sort_keys=True, cls=DjangoJSONEncoder).encode()
+    ).hexdigest()
+
+def build_corpus_index(streamfield, previous=None):
+    """
+    Text and word count of each block in streamfield as a list of {hash, text, words} dicts.
+    Entries of previous (an earlier index) are reused for blocks whose raw value hasn't changed,
+    only new or edited blocks are rendered.
+    """
+    known = {entry["hash"]: entry for entry in previous or []}
+    index = []
+    for position, raw_block in enumerate(streamfield.raw_data):
+        key = block_hash(raw_block)
+        entry = known.get(key)
+        if entry is None:
+            # blocks are separated by a newline in the full render, which lets a final full stop be stripped
+            text = get_html_text(f"{streamfield[position].render()}\n")
+            entry = {"hash": key, "text": text, "words": count_words(text)}
+        index.append(entry)
+    return index
+
+def corpus_text(index):
+    return " ".join(entry["text"] for entry in index if entry["text"])
+
+def corpus_words(index):
+    return sum(max(entry["words"], 0) for entry in index)
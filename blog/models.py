@@ -1,7 +1,8 @@
+import logging
+
 from django import forms
 from django.contrib.auth.models import Group
 from django.db import models
-from django.utils.functional import cached_property
 from django.utils.translation import gettext_lazy as _
 from modelcluster.fields import ParentalKey, ParentalManyToManyField
 from wagtail.admin.panels import (FieldPanel, InlinePanel, MultiFieldPanel,
@@ -12,6 +13,7 @@ from wagtail.models import Orderable, Page
 from wagtail.search import index
 from wagtail.snippets.blocks import SnippetChooserBlock
 
+from blocks.links import resolve_links
 from blocks.models import (CollapsibleCardBlock, CSVTableBlock,
                            ExternalLinkEmbedBlock, FlexCardBlock,
                            ImportTextBlock, LinkBlock, TranslatableTextListBlock)
@@ -20,11 +22,11 @@ from core.panels import (ImportTextAreaPanel, M2MChooserPanel, RegexPanel,
                          RestrictedFieldPanel, RestrictedInlinePanel, LocalizedChoicePanel,
                          UtilityPanel)
 from core.translations import TranslatablePageMixin
-from core.utils import count_words, get_streamfield_text
 from core.widgets.import_textarea_widget import ImportTextAreaWidget
 from product.blocks import ProductChooserBlock
 
 from .categories import BlogCategory
+from .corpus import build_corpus_index, corpus_text, corpus_words
 
 
 class BlogIndex(TranslatablePageMixin, Page):
@@ -81,6 +83,8 @@ class BlogPage(TranslatablePageMixin, Page):
     wordcount = models.IntegerField(
         null=True, blank=True, verbose_name="Word Count", default=0
     )
+    # per block text and word counts of content, maintained by update_corpus (see blog.corpus)
+    corpus_index = models.JSONField(default=list, blank=True, editable=False)
     some_date = models.DateTimeField(
         null=True, blank=True, help_text="Some helpful text"
     )
@@ -253,12 +257,38 @@ class BlogPage(TranslatablePageMixin, Page):
     class Meta:
         verbose_name = "Blog Page"
 
-    @cached_property
+    def get_context(self, request, *args, **kwargs):
+        context = super().get_context(request, *args, **kwargs)
+        # resolve every link in the content in one pass rather than per block
+        resolve_links(self.content)
+        return context
+
+    def clean(self):
+        super().clean()
+        self.update_corpus()
+
+    def update_corpus(self):
+        """
+        Refresh corpus_index and wordcount from the content, only blocks changed since the last update are rendered.
+        Runs whenever the page is cleaned, i.e. on form validation, save, save_revision and publish.
+        """
+        try:
+            self.corpus_index = build_corpus_index(self.content, self.corpus_index)
+            self.wordcount = corpus_words(self.corpus_index)
+        except Exception as e:
+            logging.error(
+                f"{type(e).__name__} at line {e.__traceback__.tb_lineno} of {__file__}: {e}"
+            )
+
+    @property
     def corpus(self):
-        return get_streamfield_text(self.content)
+        if not self.corpus_index and self.content:
+            # not built yet (page saved before the corpus index existed), build without saving
+            self.update_corpus()
+        return corpus_text(self.corpus_index)
 
-    @cached_property
-    def words(self, corpus=None):
-        if not corpus:
-            corpus = self.corpus
-        return count_words(corpus)
+    @property
+    def words(self):
+        if not self.corpus_index and self.content:
+            self.update_corpus()
+        return self.wordcount
@@ -17,6 +17,8 @@ class BlogPageListingViewSet(PageListingViewSet):
     model = BlogPage
     columns = PageListingViewSet.columns + [
         Column("some_product", label="Product", sort_key="some_product"),
+        # stored on save, see BlogPage.update_corpus
+        Column("wordcount", label="Words", sort_key="wordcount"),
     ]    
     filterset_class = BlogPageFilterSet
 
@@ -0,0 +1,166 @@
+import logging
+from html.parser import HTMLParser
+
+from django.db import transaction
+from wagtail.blocks.stream_block import StreamValue
+from wagtail.fields import StreamField
+from wagtail.models import Page, get_page_models
+
+from .models import ContentIndexEntry
+
+
+class ClassCollector(HTMLParser):
+    """Collects the class names of every element in an html fragment"""
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.classes = set()
+
+    def handle_starttag(self, tag, attrs):
+        for name, value in attrs:
+            if name == "class" and value:
+                self.classes.update(value.split())
+
+    handle_startendtag = handle_starttag
+
+
+def html_css_classes(html):
+    parser = ClassCollector()
+    parser.feed(html)
+    parser.close()
+    return parser.classes
+
+def raw_block_types(stream_data, found=None):
+    """Block types in a StreamField's raw data, at any depth (the values block_exists matches)"""
+    found = set() if found is None else found
+    if isinstance(stream_data, dict):
+        if isinstance(stream_data.get("type"), str):
+            found.add(stream_data["type"])
+        for value in stream_data.values():
+            raw_block_types(value, found)
+    elif isinstance(stream_data, (list, StreamValue.RawDataView)):
+        for item in stream_data:
+            raw_block_types(item, found)
+    return found
+
+def page_streamfields(page):
+    """(field name, StreamValue) of each StreamField of a specific page"""
+    return [
+        (field.name, getattr(page, field.name))
+        for field in page._meta.get_fields()
+        if isinstance(field, StreamField)
+    ]
+
+def streamfield_names(kind, value):
+    """Block types (from the raw data) or css classes (from the rendered field) of a StreamValue"""
+    if kind == ContentIndexEntry.BLOCK_TYPE:
+        return raw_block_types(value.raw_data)
+    return html_css_classes(str(value.render_as_block()))
+
+def index_page_content(page, revision=None):
+    """
+    Replace the index entries of a page with the block types and css classes of its StreamFields.
+    Block types come from the raw data, css classes from the rendered fields. Called when a page is published.
+    If any field fails to render, no css classes are indexed for the page and it is left to the fallback scan
+    in indexed_streamfields rather than indexed incompletely.
+    """
+    page = page.specific
+    revision_id = revision.pk if revision else page.live_revision_id
+    names = {}
+    rendered = True
+    for field_name, value in page_streamfields(page):
+        if not value:
+            continue
+        names[(field_name, ContentIndexEntry.BLOCK_TYPE)] = streamfield_names(ContentIndexEntry.BLOCK_TYPE, value)
+        if rendered:
+            try:
+                names[(field_name, ContentIndexEntry.CSS_CLASS)] = streamfield_names(ContentIndexEntry.CSS_CLASS, value)
+            except Exception as e:
+                rendered = False
+                logging.error(
+                    f"{type(e).__name__} at line {e.__traceback__.tb_lineno} of {__file__}: {e}"
+                )
+    entries = [
+        ContentIndexEntry(page=page, revision_id=revision_id, field_name=field_name, kind=kind, name=name[:255])
+        for (field_name, kind), field_names in names.items()
+        if rendered or kind != ContentIndexEntry.CSS_CLASS
+        for name in sorted(field_names)
+    ]
+    with transaction.atomic():
+        ContentIndexEntry.objects.filter(page=page).delete()
+        ContentIndexEntry.objects.bulk_create(entries, ignore_conflicts=True)
+
+def remove_page_content(page):
+    ContentIndexEntry.objects.filter(page=page).delete()
+
+def rebuild_content_index():
+    """Index every live page, for a new or out of date index (eg after changing a block template)"""
+    ContentIndexEntry.objects.exclude(page__live=True).delete()
+    for page in Page.objects.live().specific().iterator(chunk_size=100):
+        try:
+            index_page_content(page)
+        except Exception as e:
+            logging.error(
+                f"{type(e).__name__} at line {e.__traceback__.tb_lineno} of {__file__}: {e}"
+            )
+
+def unindexed_pages(kind):
+    """
+    Live pages with StreamFields and no index entries of kind: published before the index existed,
+    failed to index when published, or (for css classes) failed to render or have no css classes at all.
+    """
+    models = [
+        model for model in get_page_models()
+        if any(isinstance(field, StreamField) for field in model._meta.get_fields())
+    ]
+    if not models:
+        return Page.objects.none()
+    return (
+        Page.objects.live()
+        .type(*models)
+        .exclude(pk__in=ContentIndexEntry.objects.filter(kind=kind).values("page_id"))
+        .specific()
+    )
+
+def indexed_streamfields(kind, name):
+    """
+    (specific page, field name) of each published StreamField using block type / emitting css class name.
+    Answered from the index, live pages missing from it (see unindexed_pages) are scanned as they were before
+    the index so results are never silently incomplete.
+    """
+    found = (
+        ContentIndexEntry.objects
+        .filter(kind=kind, name=name)
+        .values_list("page_id", "field_name")
+        .distinct()
+    )
+    fields = {}
+    for page_id, field_name in found:
+        fields.setdefault(page_id, []).append(field_name)
+    pages = Page.objects.filter(pk__in=fields).specific()
+    results = [(page, field_name) for page in pages for field_name in sorted(fields[page.pk])]
+
+    for page in unindexed_pages(kind):
+        results += [
+            (page, field_name)
+            for field_name, value in page_streamfields(page)
+            if value and name in streamfield_names(kind, value)
+        ]
+    return results
+
+def pages_using_block(block_type):
+    """
+    Pages whose published StreamFields use a block type, eg pages_using_block("csv_table").
+    From the index only, use indexed_streamfields to include pages missing from it.
+    """
+    return Page.objects.filter(
+        pk__in=ContentIndexEntry.objects.filter(kind=ContentIndexEntry.BLOCK_TYPE, name=block_type).values("page_id")
+    )
+
+def pages_with_css_class(css_class):
+    """
+    Pages whose published StreamFields render an element with a css class, eg pages_with_css_class("check-list").
+    From the index only, use indexed_streamfields to include pages missing from it.
+    """
+    return Page.objects.filter(
+        pk__in=ContentIndexEntry.objects.filter(kind=ContentIndexEntry.CSS_CLASS, name=css_class).values("page_id")
+    )
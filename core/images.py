@@ -1,82 +1,158 @@
 import io
+import logging
 import math
+import os
+from dataclasses import dataclass
 
 from PIL import Image
 from wagtail.images.models import Filter
 
-
-def reduce_image_file_size(image_path, max_file_size_kb = 1024, min_quality = 75):
-    # Load the image
-    image = Image.open(image_path)
-    image_format = image.format or 'PNG'
-
-    # Calculate the file sizes
+# Image.ANTIALIAS was removed in Pillow 10, LANCZOS is the same filter
+RESAMPLE = getattr(Image, "Resampling", Image).LANCZOS
+# Formats whose file size is set by the quality option
+QUALITY_FORMATS = frozenset({"JPEG", "WEBP"})
+# Pixels in the downscaled copy used to search for a quality
+PROBE_PIXELS = 1000000
+# Fraction of the maximum file size aimed for, allowing for predictions made from the probe being off
+TARGET_RATIO = 0.95
+# Full resolution encodes allowed, the first follows the plan, the second corrects it by the size actually seen
+MAX_ENCODES = 2
+
+
+@dataclass
+class CompressionPlan:
+    """Quality (None for formats without one), fraction of the original area and predicted file size of an encode"""
+    quality: int
+    area: float
+    predicted: float
+
+
+def encode_image(image, buffer, image_format, quality=None):
+    """Encode into buffer, replacing its contents, and return the encoded size"""
+    buffer.seek(0)
+    buffer.truncate()
+    if quality is None:
+        image.save(buffer, format=image_format)
+    else:
+        image.save(buffer, format=image_format, quality=quality)
+    return buffer.tell()
+
+def scale_size(size, area):
+    """Dimensions scaled to a fraction of the area"""
+    scale = math.sqrt(area)
+    return (max(int(size[0] * scale), 1), max(int(size[1] * scale), 1))
+
+def plan_compression(image_path, max_file_size, min_quality, buffer, calibration=1):
+    """
+    Choose the quality and dimensions to encode an image with from a downscaled probe.
+    The highest quality (from the image's own down to min_quality) whose bytes per pixel on the probe,
+    over the full image, fit TARGET_RATIO of max_file_size is used. If none fit, min_quality is used
+    and the area is reduced by the remaining excess.
+    calibration scales predictions, the ratio of an encode's actual to predicted size when replanning.
+    """
+    with Image.open(image_path) as probe:
+        image_format = probe.format or "PNG"
+        pixels = probe.size[0] * probe.size[1]
+        top_quality = probe.info.get("quality", 100)
+        target = max_file_size * TARGET_RATIO
+
+        if image_format not in QUALITY_FORMATS:
+            # size is roughly proportional to area, start from the file as it is
+            predicted = os.path.getsize(image_path) * calibration
+            return CompressionPlan(None, min(target / predicted, 1), min(predicted, target))
+
+        # thumbnail uses draft for JPEGs, decoding at reduced scale rather than loading every pixel
+        probe.thumbnail(scale_size(probe.size, min(PROBE_PIXELS / pixels, 1)), RESAMPLE)
+        probe_pixels = probe.size[0] * probe.size[1]
+
+        def predict(quality):
+            return encode_image(probe, buffer, image_format, quality) / probe_pixels * pixels * calibration
+
+        low, high = min_quality, max(top_quality, min_quality)
+        predicted = predict(low)
+        if predicted > target:
+            return CompressionPlan(low, target / predicted, target)
+        while low < high:
+            quality = (low + high + 1) // 2
+            size = predict(quality)
+            if size <= target:
+                low, predicted = quality, size
+            else:
+                high = quality - 1
+        return CompressionPlan(low, 1, predicted)
+
+def compress_image_file(image_path, max_file_size_kb=1024, min_quality=75):
+    """
+    Encoded image reduced to max_file_size_kb or less, None if the file is already small enough.
+    The quality and dimensions are planned on a downscaled probe (see plan_compression) so the full image is
+    normally encoded once, and at most MAX_ENCODES (two) times when the first encode is well over or under the
+    planned size. If both are over the limit the smaller is returned and logged. Encodes reuse one buffer.
+    """
     max_file_size = max_file_size_kb * 1024
-    with io.BytesIO() as temp_buffer:
-        image.save(temp_buffer, format=image_format)
-        current_file_size = temp_buffer.tell()
-
-    # If the current file size is already below the maximum, return the image as is
-    if current_file_size <= max_file_size:
-        return image
-
-    # Get the starting quality from the original image
-    quality = getattr(image, 'info', {}).get('quality', 100)
-
-    # create new buffer to save resized image to
-    resized_image = image
-    resized_buffer = io.BytesIO()
-
-    # Define the boundaries for quality and dimensions
-    while current_file_size > max_file_size and quality > min_quality:
+    if os.path.getsize(image_path) <= max_file_size:
+        return None
+
+    with io.BytesIO() as buffer:
+        plan = plan_compression(image_path, max_file_size, min_quality, buffer)
+        with Image.open(image_path) as image:
+            image_format = image.format or "PNG"
+            original = image.size
+            if plan.area < 1:
+                # decode JPEGs at the nearest scale above the planned size
+                image.draft(image.mode, scale_size(original, plan.area))
+            image.load()
+            # a JPEG decoded at reduced scale can't be encoded larger than it was decoded
+            limit = image.size[0] * image.size[1] / (original[0] * original[1])
+            area = min(plan.area, limit)
+            data = None
+            smallest = None
+            for encode in range(MAX_ENCODES):
+                size = scale_size(original, area)
+                resized = image if size[0] >= image.size[0] else image.resize(size, RESAMPLE, reducing_gap=3.0)
+                file_size = encode_image(resized, buffer, image_format, plan.quality)
+                if file_size <= max_file_size:
+                    data = buffer.getvalue()
+                    if encode or area >= limit or file_size >= max_file_size * TARGET_RATIO ** 2:
+                        break
+                    # well under the limit after shrinking, one more encode closer to it
+                    area = min(area * max_file_size * TARGET_RATIO / file_size, limit)
+                elif data is not None:
+                    # the larger second encode is over, keep the first
+                    break
+                else:
+                    if smallest is None or file_size < smallest[0]:
+                        smallest = (file_size, buffer.getvalue())
+                    if encode == MAX_ENCODES - 1:
+                        break
+                    if plan.quality is not None:
+                        # replan with the probe's predictions corrected by the size seen, lowering quality before area
+                        plan = plan_compression(
+                            image_path, max_file_size, min_quality, buffer, file_size / plan.predicted
+                        )
+                        area = min(plan.area, limit)
+                    else:
+                        area *= max_file_size * TARGET_RATIO ** 2 / file_size
+            if data is None:
+                file_size, data = smallest
+                logging.error(f"{image_path} is {file_size} bytes after {MAX_ENCODES} encodes")
+        return data
 
-        reduce_ratio = max_file_size / current_file_size
-
-        # Reduce the quality
-        quality = int(reduce_ratio * quality)
-        if quality < min_quality: quality = min_quality
-
-        try:
-            # Resize the image using ANTIALIAS and save to resized_buffer with the current quality
-            resized_image = image.resize(image.size, Image.ANTIALIAS)
-            resized_image.save(resized_buffer, format=image_format, quality=quality)
-
-            # Calculate the file size of the resized image
-            resized_buffer.seek(0)
-            current_file_size = len(resized_buffer.getvalue())
-        except:
-            # file type does not support quality attribute
-            break
-
-    # If further reduction is needed, reduce image dimensions
-    while current_file_size > max_file_size:
-        # Reduce the dimensions by square root of the reduce ratio
-        # (reduce area by ratio, not dimensions)
-        reduce_ratio = max_file_size / current_file_size
-        width = int(math.sqrt(reduce_ratio) * resized_image.width)
-        height = int(math.sqrt(reduce_ratio) * resized_image.height)
-
-        # Resize the image using ANTIALIAS and save to a new BytesIO buffer
-        resized_buffer = io.BytesIO()
-        resized_image = resized_image.resize((width, height), Image.ANTIALIAS)
-        resized_image.save(resized_buffer, format=image_format)
-
-        # Calculate the file size of the resized image
-        resized_buffer.seek(0)
-        current_file_size = len(resized_buffer.getvalue())
-
-    # Convert the final resized and compressed image from the BytesIO buffer to PIL Image
-    resized_buffer.seek(0)
-    return Image.open(resized_buffer)
+def reduce_image_file_size(image_path, max_file_size_kb = 1024, min_quality = 75):
+    data = compress_image_file(image_path, max_file_size_kb, min_quality)
+    if data is None:
+        return Image.open(image_path)
+    return Image.open(io.BytesIO(data))
 
 def check_image_size(image, max_file_size_kb = 1024, min_quality = 75):
 
     if image.file_size <= max_file_size_kb * 1024:
         return True
     else:
-        # resize image, save and update metadata
-        resized_image = reduce_image_file_size(image.file.path, max_file_size_kb, min_quality)
-        resized_image.save(image.file.path)
+        # write the compressed file as encoded, saving it through PIL again would re-encode at default quality
+        data = compress_image_file(image.file.path, max_file_size_kb, min_quality)
+        if data is not None:
+            with open(image.file.path, "wb") as file:
+                file.write(data)
         image._set_image_file_metadata()
         # delete 'original' rendition if exists
         flt = Filter(spec='original')
@@ -86,5 +162,3 @@ def check_image_size(image, max_file_size_kb = 1024, min_quality = 75):
         except:
             pass
         return False
-
-
@@ -0,0 +1,93 @@
+import threading
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import translation
+from wagtail.coreutils import get_supported_content_language_variant
+from wagtail.models import Locale
+
+# Version of the locale registry shared between processes, replaced whenever a Locale is saved or deleted
+LOCALE_REGISTRY_CACHE_KEY = "core.locales.version"
+
+_registry = None
+# per-thread flag, cleared at the start of each request so the registry version is checked once per request
+_request_state = threading.local()
+
+
+class LocaleRegistry:
+    """
+    All enabled locales (Locale.objects) loaded from a single query, indexed by id and language_code.
+    Instances are shared by every request in the process, treat them as read-only.
+    """
+    def __init__(self, locales, version=None):
+        self.locales = list(locales)
+        self.version = version
+        self.by_id = {locale.pk: locale for locale in self.locales}
+        self.by_language_code = {locale.language_code: locale for locale in self.locales}
+
+    def get_for_language(self, language_code):
+        """Registry equivalent of Locale.objects.get_for_language"""
+        try:
+            return self.by_language_code[get_supported_content_language_variant(language_code)]
+        except KeyError:
+            raise Locale.DoesNotExist(f"No locale for language code '{language_code}'")
+
+    def get_default(self):
+        """Registry equivalent of Locale.get_default"""
+        return self.get_for_language(settings.LANGUAGE_CODE)
+
+    def get_active(self):
+        """Registry equivalent of Locale.get_active"""
+        try:
+            return self.get_for_language(translation.get_language())
+        except (Locale.DoesNotExist, LookupError):
+            return self.get_default()
+
+
+def get_locale_registry():
+    """
+    Return the process locale registry, loading it on first use.
+    Within a request, the shared version is checked on first access only, later calls make no queries or cache hits.
+    """
+    global _registry
+    registry = _registry
+    if registry is not None and not getattr(_request_state, "checked", True):
+        _request_state.checked = True
+        if cache.get(LOCALE_REGISTRY_CACHE_KEY) != registry.version:
+            registry = None
+    if registry is None:
+        version = cache.get_or_set(LOCALE_REGISTRY_CACHE_KEY, uuid4().hex, None)
+        registry = _registry = LocaleRegistry(Locale.objects.all(), version)
+        _request_state.checked = True
+    return registry
+
+def invalidate_locale_registry():
+    """Drop the locale registry in this and (via the shared version) every other process, call when a Locale changes"""
+    global _registry
+    _registry = None
+    cache.set(LOCALE_REGISTRY_CACHE_KEY, uuid4().hex, None)
+
+def start_locale_request():
+    """Have the next registry access in this thread check the shared version, called on request_started"""
+    _request_state.checked = False
+
+def get_all_locales():
+    """Cached equivalent of Locale.objects.all()"""
+    return get_locale_registry().locales
+
+def get_locale(locale_id):
+    """Cached Locale for locale_id, None if there is none"""
+    return get_locale_registry().by_id.get(locale_id)
+
+def get_locale_for_language(language_code):
+    """Cached equivalent of Locale.objects.get_for_language, raises Locale.DoesNotExist"""
+    return get_locale_registry().get_for_language(language_code)
+
+def get_default_locale():
+    """Cached equivalent of Locale.get_default()"""
+    return get_locale_registry().get_default()
+
+def get_active_locale():
+    """Cached equivalent of Locale.get_active()"""
+    return get_locale_registry().get_active()
@@ -0,0 +1,32 @@
+from django.db import models
+from wagtail.models import Page, Revision
+
+
+class ContentIndexEntry(models.Model):
+    """
+    A block type used, or a css class emitted, by a StreamField of a page's published revision.
+    Maintained by core.content_index when pages are published, unpublished or deleted.
+    """
+    BLOCK_TYPE = "block"
+    CSS_CLASS = "class"
+    KIND_CHOICES = [
+        (BLOCK_TYPE, "Block type"),
+        (CSS_CLASS, "CSS class"),
+    ]
+
+    page = models.ForeignKey(Page, on_delete=models.CASCADE, related_name="+")
+    revision = models.ForeignKey(Revision, null=True, blank=True, on_delete=models.SET_NULL, related_name="+")
+    field_name = models.CharField(max_length=255)
+    kind = models.CharField(max_length=5, choices=KIND_CHOICES)
+    name = models.CharField(max_length=255)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["kind", "name"]),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=["page", "field_name", "kind", "name"], name="unique_content_index_entry"),
+        ]
+
+    def __str__(self):
+        return f"{self.page_id} {self.field_name}: {self.kind} {self.name}"
@@ -0,0 +1,52 @@
+import logging
+
+from django.core.signals import request_started
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from wagtail.models import Locale
+from wagtail.signals import page_published, page_unpublished
+from wagtail_localize.models import Translation, TranslationSource
+
+from .content_index import index_page_content, remove_page_content
+from .locales import invalidate_locale_registry, start_locale_request
+from .translations import invalidate_translation_lineage
+
+
+@receiver(post_save, sender=Translation)
+@receiver(post_delete, sender=Translation)
+def clear_translation_lineage(sender, instance, **kwargs):
+    # translation_key of the source object, the source may already be gone when cascading a delete
+    translation_key = (
+        TranslationSource.objects
+        .filter(pk=instance.source_id)
+        .values_list("object_id", flat=True)
+        .first()
+    )
+    if translation_key:
+        invalidate_translation_lineage(translation_key)
+
+
+@receiver(post_save, sender=Locale)
+@receiver(post_delete, sender=Locale)
+def clear_locale_registry(sender, instance, **kwargs):
+    invalidate_locale_registry()
+
+
+@receiver(request_started)
+def check_locale_registry(sender, **kwargs):
+    start_locale_request()
+
+
+@receiver(page_published)
+def index_published_page(sender, instance, revision=None, **kwargs):
+    try:
+        index_page_content(instance, revision)
+    except Exception as e:
+        logging.error(
+            f"{type(e).__name__} at line {e.__traceback__.tb_lineno} of {__file__}: {e}"
+        )
+
+
+@receiver(page_unpublished)
+def unindex_unpublished_page(sender, instance, **kwargs):
+    remove_page_content(instance)
@@ -1,129 +1,446 @@
+import atexit
+import glob
+import logging
 import os
+import sqlite3
+import tempfile
 import threading
+from contextlib import closing, contextmanager
+from urllib.parse import urlsplit
 
-from bs4 import BeautifulSoup
-from django.template.loader import get_template, render_to_string
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.template import Context
+from django.template.base import render_value_in_context
+from django.template.defaultfilters import date as date_filter
+from django.template.loader import render_to_string
+from django.utils.timezone import template_localtime
+from lxml import etree
+from wagtail.models import Site
+
+from .locales import get_locale
+from .translations import prefetch_alternates
+
+# Document envelope as rendered by the sitemap.xml template, <url> entries are streamed between the two
+SITEMAP_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '\n'
+    '<urlset \n'
+    '  xmlns="http://www.sitemaps.org/schemas/sitemap/0.9" \n'
+    '  xmlns:xhtml="http://www.w3.org/TR/xhtml11/xhtml11_schema.html"\n'
+    '>\n'
+)
+SITEMAP_FOOTER = '\n</urlset>\n'
+
+# Protocol limits for a single sitemap file
+SITEMAP_MAX_URLS = 50000
+SITEMAP_MAX_BYTES = 50 * 1024 * 1024
+
+# Seconds the rendered sitemap view response is cached for, cleared by the page publish/unpublish/delete hooks
+SITEMAP_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Seconds the background writer waits for more updates before writing a batch
+SITEMAP_WRITER_DELAY = 1.0
+
+
+def get_sitemap():
+    """
+    Return the sitemap writer for this project - ShardedSiteMap if settings.SITEMAP_INDEX is set, otherwise SiteMap
+    """
+    if getattr(settings, "SITEMAP_INDEX", False):
+        return ShardedSiteMap()
+    return SiteMap()
+
+
+def shard_file_order(filename):
+    """Sort key of a shard filename ({shard}.{n}.xml): shard name, then file number"""
+    shard, number, _ = filename.rsplit(".", 2)
+    return (shard, int(number))
+
+
+def sitemap_cache_key(site_id):
+    """Cache key for the rendered sitemap view response of a site"""
+    return f"core.sitemap.{site_id}"
+
+
+def invalidate_sitemap_cache():
+    """Drop the cached sitemap view responses for all sites"""
+    cache.delete_many([sitemap_cache_key(site_id) for site_id in Site.objects.values_list("id", flat=True)])
+
+
+def format_lastmod(lastmod):
+    """Return lastmod as rendered by the sitemap template (YYYY-MM-DD in the current timezone)"""
+    if not lastmod or isinstance(lastmod, str):
+        return lastmod
+    return date_filter(template_localtime(lastmod), "Y-m-d")
+
+
+def render_url_entry(location, lastmod=None, alternates=None, changefreq=None, priority=None):
+    """
+    Return the <url> element for a sitemap entry exactly as the sitemap.xml template renders it.
+    lastmod may be a date/datetime or an already formatted YYYY-MM-DD string.
+    """
+    context = Context()
+
+    def value(item):
+        return render_value_in_context(item, context)
+
+    entry = f"<url><loc>{value(location)}</loc>"
+    if lastmod:
+        entry += f"<lastmod>{value(format_lastmod(lastmod))}</lastmod>"
+    if changefreq:
+        entry += f"<changefreq>{value(changefreq)}</changefreq>"
+    if priority:
+        entry += f"<priority>{value(priority)}</priority>"
+    for alternate in alternates or []:
+        entry += (
+            f'<xhtml:link rel="alternate" hreflang="{value(alternate["lang_code"])}" '
+            f'href="{value(alternate["location"])}"/>'
+        )
+    return entry + "</url>"
+
+
+class AtomicFile:
+    """
+    Text file written to a temporary file in the same folder and renamed over path on close, readers never see a
+    partially written file. Leaving the context on an exception (or calling discard) drops the temporary file instead.
+    """
+    def __init__(self, path):
+        self.path = path
+        fd, self.temp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".", suffix=".tmp")
+        os.chmod(self.temp_path, 0o644)
+        self.file = os.fdopen(fd, "w", encoding="utf-8")
+
+    def write(self, text):
+        self.file.write(text)
+
+    def writelines(self, lines):
+        self.file.writelines(lines)
+
+    def close(self):
+        self.file.close()
+        os.replace(self.temp_path, self.path)
+
+    def discard(self):
+        self.file.close()
+        if os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type:
+            self.discard()
+        else:
+            self.close()
+
+
+class SiteMapWriter:
+    """
+    Single background worker per sitemap file. Updates are queued and coalesced per location (the latest add/remove
+    wins), then written as one batch - one index transaction and one rewrite of each affected file.
+    Bursts of updates (bulk publish, workflow approvals) are collected for SITEMAP_WRITER_DELAY seconds before writing.
+    A queued generate() supersedes any pending updates as the sitemap is rebuilt from the page tree.
+    Use flush() (or flush_sitemap_writers()) to wait for pending updates, e.g. in tests or management commands.
+    """
+    _writers = {}
+    _lock = threading.Lock()
+
+    def __init__(self, sitemap, delay=None):
+        self.sitemap = sitemap
+        self.delay = getattr(settings, "SITEMAP_WRITER_DELAY", SITEMAP_WRITER_DELAY) if delay is None else delay
+        self.pending = {}
+        self.site = None
+        self.busy = False
+        self.flushing = False
+        self.condition = threading.Condition()
+        self.thread = None
+
+    @classmethod
+    def for_sitemap(cls, sitemap):
+        """Return the writer for the sitemap's file, creating it on first use"""
+        key = (sitemap.__class__, os.path.abspath(sitemap.sitemap_path))
+        with cls._lock:
+            if key not in cls._writers:
+                cls._writers[key] = cls(sitemap)
+            return cls._writers[key]
+
+    def _start(self):
+        # call with self.condition held
+        if not (self.thread and self.thread.is_alive()):
+            self.thread = threading.Thread(target=self._run, name="sitemap-writer", daemon=True)
+            self.thread.start()
+        self.condition.notify_all()
+
+    def add(self, entry):
+        """Queue add/amend of entry (SiteMap.add_url kwargs)"""
+        with self.condition:
+            self.pending[entry["location"]] = entry
+            self._start()
+
+    def remove(self, location):
+        """Queue removal of location"""
+        with self.condition:
+            self.pending[location] = None
+            self._start()
+
+    def generate(self, site):
+        """Queue a full rebuild of the sitemap for site"""
+        with self.condition:
+            self.site = site
+            self.pending.clear()
+            self._start()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.pending or self.site)
+                # collect the rest of the burst unless someone is waiting on a flush
+                self.condition.wait_for(lambda: self.flushing, self.delay)
+                operations, self.pending = self.pending, {}
+                site, self.site = self.site, None
+                self.busy = True
+            try:
+                if site:
+                    self.sitemap.generate_sitemap(site)
+                if operations:
+                    self.sitemap.apply(operations)
+            except Exception as e:
+                logging.error(
+                    f"{type(e).__name__} at line {e.__traceback__.tb_lineno} of {__file__}: {e}"
+                )
+            finally:
+                # don't leave this thread's database connection open between batches
+                connections.close_all()
+                with self.condition:
+                    self.busy = False
+                    self.condition.notify_all()
+
+    def flush(self, timeout=None):
+        """
+        Write any pending updates now and block until the writer is idle. Returns False if timeout expired first.
+        """
+        with self.condition:
+            self.flushing = True
+            self.condition.notify_all()
+            try:
+                return self.condition.wait_for(lambda: not (self.pending or self.site or self.busy), timeout)
+            finally:
+                self.flushing = False
+
+    @classmethod
+    def flush_all(cls, timeout=None):
+        """Flush every sitemap writer in this process"""
+        with cls._lock:
+            writers = list(cls._writers.values())
+        return all([writer.flush(timeout) for writer in writers])
+
+
+def flush_sitemap_writers(timeout=None):
+    """
+    Block until all queued sitemap updates in this process are written
+    """
+    return SiteMapWriter.flush_all(timeout)
+
+
+# write out anything still queued when the process exits, the worker threads are daemons
+atexit.register(flush_sitemap_writers, 30)
 
 
 class SiteMap:
     """
     Class for large sitemaps. Writes sitemap to file, use Django view to serve sitemap.
     Optional sitemap_path defines the path to the sitemap you are working with, defaults to sitemap.xml in web root.
+    Rendered <url> entries are kept in an on-disk index (sqlite, sitemap_path + '.db') keyed by location so that
+    add/remove only patch a single row. The sitemap file is then streamed out of the index without any xml parsing.
     For wagtail pages, use add_page/remove_page to add/amend/remove relevant entry. Call from appropriate hooks.
-    generate_sitemap_from_page will create a sitemap for the site the passed page is in. 
+    generate_sitemap_from_page will create a sitemap for the site the passed page is in.
     """
     def __init__(self, sitemap_path="sitemap.xml"):
         self.sitemap_path = sitemap_path
-        self.soup = None
-
-    def _get_soup(self):
-        """Read and parse sitemap xml"""
-        with open(self.sitemap_path, "r") as file:
-            self.soup = BeautifulSoup(file, "xml")
+        self.index_path = f"{sitemap_path}.db"
 
-    def find_url_entry(self, location):
+    @contextmanager
+    def _index(self):
         """
-        Look for <url> element with <loc> child that has value=location
-        Return element if found or None
+        Open the location index. If no index exists yet but there is a sitemap file (e.g. one written before the index
+        was introduced), the index is seeded from that file.
         """
-        if not self.soup:
-            self._get_soup()
+        seed = not os.path.exists(self.index_path) and os.path.exists(self.sitemap_path)
+        with closing(sqlite3.connect(self.index_path)) as connection:
+            with connection:
+                connection.execute(
+                    "CREATE TABLE IF NOT EXISTS url ("
+                    "location TEXT PRIMARY KEY, shard TEXT NOT NULL DEFAULT '', lastmod TEXT, entry TEXT NOT NULL"
+                    ")"
+                )
+                connection.execute(
+                    "CREATE TABLE IF NOT EXISTS shard_file ("
+                    "filename TEXT PRIMARY KEY, shard TEXT NOT NULL, location TEXT NOT NULL, lastmod TEXT"
+                    ")"
+                )
+                if seed:
+                    self._seed_index(connection)
+            with connection:
+                yield connection
 
-        def match_loc(element):
-            return element.name == "loc" and element.string.strip() == location
+    def _seed_index(self, connection):
+        """Populate the index from the <url> elements of the existing sitemap file"""
+        def child_text(element, name):
+            child = next((item for item in element if etree.QName(item).localname == name), None)
+            return child.text.strip() if child is not None and child.text else None
 
-        match = self.soup.find(match_loc)
-        return match.parent if match else None
+        for _, element in etree.iterparse(self.sitemap_path, events=("end",), tag="{*}url"):
+            location = child_text(element, "loc")
+            if location:
+                alternates = [
+                    {"lang_code": item.get("hreflang"), "location": item.get("href")}
+                    for item in element
+                    if etree.QName(item).localname == "link"
+                ]
+                self._upsert(
+                    connection,
+                    location,
+                    lastmod=child_text(element, "lastmod"),
+                    alternates=alternates,
+                    changefreq=child_text(element, "changefreq"),
+                    priority=child_text(element, "priority"),
+                )
+            element.clear()
 
-    def add_url(self, location, lastmod, alternates=None, changefreq=None, priority=None):
+    def _upsert(self, index, location, lastmod=None, alternates=None, changefreq=None, priority=None, shard=""):
         """
-        Look for <url> element with <loc> child that has value=location
-        Add <url> element with passed parameters if not found, otherwise amend existing element
+        Write the rendered entry for location to the index, return the shard it was previously held in (or None)
         """
-        url_entry = self.find_url_entry(location)
-        if url_entry:
-            url_entry.clear()
-        else:
-            url_entry = self.soup.new_tag("url")
-            self.soup.urlset.insert(0, url_entry)
+        row = index.execute("SELECT shard FROM url WHERE location = ?", (location,)).fetchone()
+        # upsert keeps the rowid, amended entries hold their position in the sitemap
+        index.execute(
+            "INSERT INTO url (location, shard, lastmod, entry) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(location) DO UPDATE SET "
+            "shard = excluded.shard, lastmod = excluded.lastmod, entry = excluded.entry",
+            (
+                location,
+                shard,
+                format_lastmod(lastmod),
+                render_url_entry(location, lastmod, alternates, changefreq, priority),
+            ),
+        )
+        return row[0] if row else None
 
-        # Populate the <url> element with the supplied values
-        loc_tag = self.soup.new_tag("loc")
-        loc_tag.string = location
-        url_entry.append(loc_tag)
+    def exists(self):
+        """True if the sitemap has been generated"""
+        return os.path.exists(self.sitemap_path)
 
-        lastmod_tag = self.soup.new_tag("lastmod")
-        lastmod_tag.string = (
-            lastmod if type(lastmod) == "str" else lastmod.date().isoformat()
-        )
-        url_entry.append(lastmod_tag)
+    def get_page_entry(self, page):
+        """Return add_url kwargs for page"""
+        return page.get_sitemap_urls()
 
-        if alternates:
-            for alternate in alternates:
-                alternate_tag = self.soup.new_tag(
-                    "xhtml:link", hreflang=alternate["lang_code"], href=alternate["location"]
-                )
-                url_entry.append(alternate_tag)
+    def find_url_entry(self, location):
+        """
+        Look for <url> entry with <loc> value=location
+        Return rendered entry if found or None
+        """
+        with self._index() as index:
+            row = index.execute("SELECT entry FROM url WHERE location = ?", (location,)).fetchone()
+        return row[0] if row else None
+
+    def apply(self, operations):
+        """
+        Apply a batch of changes to the index in a single transaction, then rewrite the affected sitemap files once.
+        operations is a dict of location: add_url kwargs (including location), or location: None to remove the entry.
+        Returns the set of shards that were changed.
+        Runs on the writer thread, queue changes through self.writer so writes to the files stay serialized.
+        """
+        shards = set()
+        with self._index() as index:
+            for location, entry in operations.items():
+                row = index.execute("SELECT shard FROM url WHERE location = ?", (location,)).fetchone()
+                if entry is None:
+                    if row:
+                        index.execute("DELETE FROM url WHERE location = ?", (location,))
+                        shards.add(row[0])
+                else:
+                    self._upsert(index, **entry)
+                    shards.add(entry.get("shard", ""))
+                    if row:
+                        shards.add(row[0])
+        if shards:
+            self.save(shards)
+        return shards
 
-        if changefreq:
-            changefreq_tag = self.soup.new_tag("changefreq")
-            changefreq_tag.string = changefreq
-            url_entry.append(changefreq_tag)
+    @property
+    def writer(self):
+        """Background writer shared by all SiteMap instances for this sitemap file"""
+        return SiteMapWriter.for_sitemap(self)
 
-        if priority:
-            priority_tag = self.soup.new_tag("priority")
-            priority_tag.string = priority
-            url_entry.append(priority_tag)
+    def flush(self, timeout=None):
+        """
+        Block until all queued background updates have been written. Returns False if timeout expired first.
+        """
+        return self.writer.flush(timeout)
 
-        self.save()
+    def add_url(self, location, lastmod, alternates=None, changefreq=None, priority=None, shard=""):
+        """
+        Add <url> entry with passed parameters if not found, otherwise amend existing entry
+        Written by the background writer, blocks until the write has finished
+        """
+        self.writer.add({
+            "location": location,
+            "lastmod": lastmod,
+            "alternates": alternates,
+            "changefreq": changefreq,
+            "priority": priority,
+            "shard": shard,
+        })
+        self.writer.flush()
 
     def add_page(self, page, thread=True):
         """
         Add or ammend page entry using page get_sitemap_urls
-        thread=True passes execution back immediately without waiting for completion
-        """
-        if os.path.exists(self.sitemap_path):
-            if thread:
-                threading.Thread(
-                    target=self.add_url,
-                    kwargs=page.get_sitemap_urls(),
-                ).start()
-            else:
-                self.add_url(**page.get_sitemap_urls())
+        thread=True queues the update on the background writer and passes execution back immediately,
+        otherwise blocks until the writer has written it
+        """
+        if self.exists():
+            self.writer.add(self.get_page_entry(page))
+            if not thread:
+                self.writer.flush()
         else:
             self.generate_sitemap_from_page(page, thread)
 
     def remove_url(self, location):
         """
-        Remove <url> element that has <loc> value matching location
+        Remove <url> entry that has <loc> value matching location, return True if it was found
+        Written by the background writer, blocks until the write has finished
         """
-        url_entry = self.find_url_entry(location)
-        if url_entry:
-            url_entry.extract()
-            self.save()
-            return True
-        return False
+        found = self.find_url_entry(location) is not None
+        self.writer.remove(location)
+        self.writer.flush()
+        return found
 
     def remove_page(self, page, thread=True):
         """
         Remove page entry
-        thread=True passes execution back immediately without waiting for completion
+        thread=True queues the update on the background writer and passes execution back immediately,
+        otherwise blocks until the writer has written it
         """
-        if os.path.exists(self.sitemap_path):
-            if thread:
-                threading.Thread(target=self.remove_url, args=(page.full_url,)).start()
-            else:
-                self.remove_url(page.full_url)
+        if self.exists():
+            self.writer.remove(page.full_url)
+            if not thread:
+                self.writer.flush()
         else:
             self.generate_sitemap_from_page(page, thread)
 
-    def save(self):
+    def save(self, shards=None):
         """
-        Save sitemap soup object to file
+        Stream the indexed <url> entries to the sitemap file
+        shards is ignored, a single sitemap file is always rewritten in full
         """
-        if self.soup:
-            with open(self.sitemap_path, "w") as file:
-                file.write(str(self.soup))
+        with self._index() as index, AtomicFile(self.sitemap_path) as file:
+            file.write(SITEMAP_HEADER)
+            file.writelines(entry for (entry,) in index.execute("SELECT entry FROM url ORDER BY rowid"))
+            file.write(SITEMAP_FOOTER)
 
     def generate_sitemap_from_page(self, page, thread=True):
         """
@@ -133,31 +450,142 @@ class SiteMap:
 
     def generate_sitemap_from_site(self, site, thread=True):
         """
-        Generate sitemap for site, thread=true will run in background
+        Generate sitemap for site, thread=true will run in background, otherwise blocks until it is written
         """
-        if thread:
-            threading.Thread(target=self.generate_sitemap, args=(site,)).start()
-        else:
-            self.generate_sitemap(site)
+        self.writer.generate(site)
+        if not thread:
+            self.writer.flush()
 
-    def generate_sitemap(self, site):
+    def get_site_pages(self, site):
         """
-        Creates a new sitemap for the passed site 
+        Pages to include when generating the sitemap for site
         For multi-lingual, repeat for each of page.get_site().root_page.siblings
         """
-        urlset = []
-        home = site.root_page
-        for child_page in (
-            home.get_descendants(inclusive=True).defer_streamfields().live().public().specific()
-        ):
-            urlset.append(child_page.get_sitemap_urls())
+        return site.root_page.get_descendants(inclusive=True).defer_streamfields().live().public().specific()
+
+    def generate_sitemap(self, site):
+        """
+        Creates a new sitemap for the passed site
+        """
+        with self._index() as index:
+            index.execute("DELETE FROM url")
+            for page in prefetch_alternates(self.get_site_pages(site)):
+                entry = self.get_page_entry(page)
+                if entry:
+                    self._upsert(index, **entry)
+        self.save()
+
+
+class ShardedSiteMap(SiteMap):
+    """
+    Sitemap index mode - sitemap_path is written as a <sitemapindex> pointing at shard files in the same folder.
+    Entries are sharded by locale and site section (the top level page under each locale home), each shard is split
+    into numbered files ({language_code}.{section}.{n}.xml) so that no file exceeds max_urls or max_bytes.
+    Shard names are separated by '.', which can't appear in a language code or a page slug.
+    Adding or removing a page only rewrites the files of the shard the page belongs to and the sitemap index.
+    Shard locations in the index assume the shard files are served from the web root.
+    """
+    def __init__(self, sitemap_path="sitemap-index.xml", max_urls=SITEMAP_MAX_URLS, max_bytes=SITEMAP_MAX_BYTES):
+        super().__init__(sitemap_path)
+        self.shard_dir = os.path.dirname(sitemap_path)
+        self.max_urls = max_urls
+        self.max_bytes = max_bytes
+
+    def _seed_index(self, connection):
+        # the index document only holds shard locations, shards are rebuilt with generate_sitemap instead
+        pass
+
+    def exists(self):
+        return os.path.exists(self.sitemap_path) and os.path.exists(self.index_path)
+
+    def get_shard(self, page):
+        """Return shard name for page: language code plus the slug of the top level section ('home' for locale root)"""
+        # url_path is /<locale home slug>/<section slug>/.../
+        path = page.url_path.strip("/").split("/")
+        section = path[1] if len(path) > 1 else "home"
+        # from the locale registry, page.locale would query each page's locale
+        return f"{get_locale(page.locale_id).language_code}.{section}"
+
+    def get_page_entry(self, page):
+        entry = super().get_page_entry(page)
+        if entry:
+            entry["shard"] = self.get_shard(page)
+        return entry
+
+    def get_site_pages(self, site):
+        """Pages from the site root and each of its translations"""
+        for locale_home in site.root_page.get_translations(inclusive=True).live():
+            yield from (
+                locale_home.get_descendants(inclusive=True).defer_streamfields().live().public().specific()
+            )
+
+    def _write_shard(self, index, shard):
+        """
+        Rewrite the files for shard, starting a new file whenever max_urls or max_bytes would be exceeded.
+        Files left over from a previously larger shard are deleted.
+        """
+        envelope = len(SITEMAP_HEADER.encode()) + len(SITEMAP_FOOTER.encode())
+        shard_files = []
+        file = None
+        count, size = 0, envelope
         try:
-            urlset.remove([])
-        except:
-            pass
+            for location, lastmod, entry in index.execute(
+                "SELECT location, lastmod, entry FROM url WHERE shard = ? ORDER BY rowid", (shard,)
+            ):
+                entry_size = len(entry.encode())
+                if file is None or count >= self.max_urls or size + entry_size > self.max_bytes:
+                    if file:
+                        file.write(SITEMAP_FOOTER)
+                        file.close()
+                    filename = f"{shard}.{len(shard_files) + 1}.xml"
+                    root = urlsplit(location)
+                    shard_files.append([filename, f"{root.scheme}://{root.netloc}/{filename}", lastmod])
+                    file = AtomicFile(os.path.join(self.shard_dir, filename))
+                    file.write(SITEMAP_HEADER)
+                    count, size = 0, envelope
+                file.write(entry)
+                count += 1
+                size += entry_size
+                # lastmod is stored as YYYY-MM-DD, string comparison is date order
+                if lastmod and (not shard_files[-1][2] or lastmod > shard_files[-1][2]):
+                    shard_files[-1][2] = lastmod
+            if file:
+                file.write(SITEMAP_FOOTER)
+                file.close()
+        except Exception:
+            if file:
+                file.discard()
+            raise
+
+        index.execute("DELETE FROM shard_file WHERE shard = ?", (shard,))
+        index.executemany(
+            "INSERT INTO shard_file (filename, shard, location, lastmod) VALUES (?, ?, ?, ?)",
+            ((filename, shard, location, lastmod) for filename, location, lastmod in shard_files),
+        )
+        for path in glob.glob(os.path.join(glob.escape(self.shard_dir), f"{glob.escape(shard)}.*.xml")):
+            suffix = os.path.basename(path)[len(shard) + 1:-4]
+            if suffix.isdigit() and int(suffix) > len(shard_files):
+                os.remove(path)
 
-        template = get_template("sitemap.xml")
-        sitemap_xml = render_to_string(template.origin.name, {"urlset": urlset})
+    def save(self, shards=None):
+        """
+        Rewrite the files for the passed shard names (all shards if None), then the sitemap index
+        """
+        with self._index() as index:
+            if shards is None:
+                shards = {row[0] for row in index.execute("SELECT DISTINCT shard FROM url")}
+                shards |= {row[0] for row in index.execute("SELECT DISTINCT shard FROM shard_file")}
+            for shard in shards:
+                self._write_shard(index, shard)
+            shard_files = index.execute("SELECT filename, location, lastmod FROM shard_file").fetchall()
+            # by shard, then file number (string order would put shard.10.xml before shard.2.xml)
+            shard_files.sort(key=lambda row: shard_file_order(row[0]))
+            sitemaps = [{"location": location, "lastmod": lastmod} for _, location, lastmod in shard_files]
+        with AtomicFile(self.sitemap_path) as file:
+            file.write(render_to_string("sitemap_index.xml", {"sitemaps": sitemaps}))
 
-        with open(self.sitemap_path, "w") as file:
-            file.write(sitemap_xml)
+    def shard_path(self, filename):
+        """Return the file path for a shard filename if it is part of the current sitemap, otherwise None"""
+        with self._index() as index:
+            row = index.execute("SELECT filename FROM shard_file WHERE filename = ?", (filename,)).fetchone()
+        return os.path.join(self.shard_dir, row[0]) if row else None
@@ -1,8 +1,18 @@
+import importlib.util
+import math
 import random
-from datetime import datetime, timedelta
+import re
+from datetime import date, datetime, timedelta
+from html import unescape
+from unittest import skipUnless
 from bs4 import BeautifulSoup
-from .sitemap import SiteMap
-from .views import SitemapView
+from django.template.loader import render_to_string
+from django.test import RequestFactory, SimpleTestCase
+from django.utils import timezone
+from blocks.csv_backends import PandasCSVBackend, PythonCSVBackend
+from .sitemap import SITEMAP_FOOTER, SITEMAP_HEADER, SiteMap, render_url_entry
+from .utils import get_html_text
+from .views import sitemap
 import time
 
 def generate_test_sitemap():
@@ -50,7 +60,7 @@ def test_sitemap_gen(pg):
 
 def test_sitemap_view():
     start_time = time.time()
-    SitemapView().get(None)
+    sitemap(RequestFactory().get("/sitemap.xml"))
     print(f"Elapsed time: {time.time() - start_time:.6f} seconds")
 
 def test_init_sitemap():
@@ -58,3 +68,249 @@ def test_init_sitemap():
     sm = SiteMap()
     print(f"Elapsed time: {time.time() - start_time:.6f} seconds")
 
+
+# Parity tests: the streaming replacements must give the same output as the code they replaced,
+# over a set of fixed edge cases and a seeded random corpus (see assert_parity).
+
+def assert_parity(testcase, fixed, generate, expected, actual, samples, seed, matches=None):
+    """
+    Check actual(case) against expected(case) for each fixed case and samples cases from generate(rng),
+    failing once with every mismatch listed.
+    """
+    rng = random.Random(seed)
+    cases = list(fixed) + [generate(rng) for _ in range(samples)]
+    matches = matches or (lambda left, right: left == right)
+    mismatches = []
+    for case in cases:
+        want, got = expected(case), actual(case)
+        if not matches(want, got):
+            mismatches.append(f"{case!r}\n  expected {want!r}\n  actual   {got!r}")
+    testcase.assertFalse(mismatches, f"{len(mismatches)} of {len(cases)} cases differ:\n" + "\n".join(mismatches))
+
+def reference_html_text(html, strip_newlines=True, strip_punctuation=True, lowercase=False,
+                        strip_tags=['style', 'script', 'code']):
+    # get_streamfield_text as it was with BeautifulSoup, for rendered html
+    soup = BeautifulSoup(unescape(html), "html.parser")
+    if strip_tags:
+        for script in soup(strip_tags):
+            script.extract()
+    inner_text = ' '.join(soup.findAll(text=True))
+    inner_text = inner_text.replace('\xa0',' ')
+    inner_text = inner_text.replace(' & ',' and ')
+    inner_text = re.sub(r'\bfa-[^ ]*', '', inner_text)
+    if strip_newlines:
+        inner_text = re.sub(r'([\n]+.?)+', ' ', inner_text)
+    if strip_punctuation:
+        inner_text = re.sub(r'(?<=\D)/(?=\D)', ' ', inner_text)
+        inner_text = re.sub(r'\.(?=\s)', '', inner_text)
+        punctuation = '!"#$%&\'()*+,-:;<=>?@[\\]^_`{|}~“”‘’–«»‹›¿¡'
+        inner_text = inner_text.translate(str.maketrans('', '', punctuation))
+    if lowercase:
+        inner_text = inner_text.lower()
+    inner_text = re.sub(r' +', ' ', inner_text).strip()
+    return inner_text
+
+HTML_TEXT_CASES = [
+    '',
+    'plain text',
+    '<p>Hello <strong>world</strong>.</p>\n<p>Second paragraph.</p>',
+    '<p>Fish &amp; chips&nbsp;&amp;&nbsp;peas, 1/2 price, either/or. 3.14 and 1.2.3.</p>',
+    '<p>&lt;b&gt;escaped&lt;/b&gt; &#169; &#x27;quoted&#x27; &copy;</p>',
+    '<div><i class="fa-solid fa-house"></i> fa-house home</div>',
+    '<style>.a{color:red}</style><script>var a = "<p>x</p>";</script><p>visible</p><code>hidden()</code>',
+    '<ul>\n  <li>one</li>\n  <li>two</li>\n</ul>',
+    '<p>line<br>break<br/>again<img src="a.png" alt="alt text"></p>',
+    '<!-- comment --><p>after comment</p>',
+    '<p>unclosed <em>tags<p>next',
+    '<pre>  keep\n  spacing  </pre>',
+    '<p>«Guillemets» “quotes” ‘single’ – dash ¿question? ¡bang!</p>',
+    '<a href="/x?a=1&b=2">link & text</a> R&D a < b',
+    '<table><tr><td>1</td><td>2.5</td></tr></table>',
+]
+
+def random_html(rng):
+    words = [
+        'alpha', 'Beta', 'gamma.', 'delta,', '1/2', 'and/or', '3.5', '&amp;', '&nbsp;', '&lt;', '&#8211;', 'fa-star',
+        '“quoted”', 'x', '\n', '  ', '.', '&', 'rock&roll', 'tab\tstop',
+    ]
+    inline = ['strong', 'em', 'span', 'a', 'code']
+    block = ['p', 'div', 'li', 'h2', 'blockquote', 'script', 'style']
+
+    def text():
+        return ' '.join(rng.choice(words) for _ in range(rng.randint(0, 6)))
+
+    def fragment(depth):
+        parts = []
+        for _ in range(rng.randint(1, 4)):
+            choice = rng.random()
+            if choice < 0.4 or depth > 2:
+                parts.append(text())
+            elif choice < 0.6:
+                tag = rng.choice(inline)
+                parts.append(f'<{tag} class="c{rng.randint(0, 3)}">{fragment(depth + 1)}</{tag}>')
+            elif choice < 0.9:
+                tag = rng.choice(block)
+                # script and style hold raw text only
+                content = text() if tag in ('script', 'style') else fragment(depth + 1)
+                parts.append(f'<{tag}>{content}</{tag}>\n')
+            elif choice < 0.95:
+                parts.append('<br>')
+            else:
+                parts.append(f'<!-- {text()} -->')
+        return ''.join(parts)
+
+    return fragment(0)
+
+HTML_TEXT_OPTIONS = [
+    {},
+    {'strip_newlines': False},
+    {'strip_punctuation': False, 'lowercase': True},
+    {'strip_tags': []},
+    {'strip_tags': ['code']},
+]
+
+
+class HtmlTextParityTests(SimpleTestCase):
+    def test_html_text_parity(self):
+        assert_parity(
+            self, HTML_TEXT_CASES, random_html,
+            lambda html: [reference_html_text(html, **kwargs) for kwargs in HTML_TEXT_OPTIONS],
+            lambda html: [get_html_text(html, **kwargs) for kwargs in HTML_TEXT_OPTIONS],
+            samples=500, seed=20,
+        )
+
+
+def parse_outcome(backend, data, column_headers):
+    try:
+        return backend.parse(data, column_headers)
+    except Exception as e:
+        return e
+
+def cell_matches(left, right):
+    if isinstance(left, float) and isinstance(right, float):
+        return left == right or math.isclose(left, right, rel_tol=1e-12)
+    return type(left) is type(right) and left == right
+
+def columns_match(expected, actual):
+    if isinstance(expected, Exception) or isinstance(actual, Exception):
+        # both backends reject the table, messages may differ
+        return isinstance(expected, Exception) and isinstance(actual, Exception)
+    return len(expected) == len(actual) and all(
+        left.name == right.name and left.kind == right.kind and len(left.values) == len(right.values)
+        and all(cell_matches(a, b) for a, b in zip(left.values, right.values))
+        for left, right in zip(expected, actual)
+    )
+
+# Known differences: the python backend rejects rows with extra fields, and reads integers above uint64 as text
+CSV_TABLE_CASES = [
+    'a,b,c\n1,2,3\n4,5,6',
+    'name,value\napple,1.5\npear,2.25\nplum,',
+    'x,y\n1.0,2.0\n3.0,\n,4.0',
+    'flag,count\nTrue,1\nfalse,2\nTRUE,\n,3',
+    'a,a,,b\n1,2,3,4',
+    'n\nNA\nnull\nN/A\n7',
+    'text\n"comma, inside"\n"quote ""here"""\nplain',
+    'mixed\n1\ntwo\n3.5',
+    'big\n9223372036854775807\n-9223372036854775808',
+    'sci\n1e3\n2.5E-2\n.5',
+    'inf\ninf\n-inf\n1.5',
+    'short,rows,here\n1,2\n3',
+    'a,b\n\n1,2\n\n3,4\n',
+    '1,2,3\n4,5,6',
+]
+
+def random_csv(rng):
+    pools = {
+        'integer': ['0', '1', '-2', '42', '1000', '007'],
+        'float': ['1.5', '-0.25', '3.0', '1e3', '2.5e-1', '0.1', '100.125'],
+        'boolean': ['True', 'False', 'TRUE', 'false', 'true', 'FALSE'],
+        'string': ['apple', 'pear plum', '"a, b"', 'x1', 'N.A.', '""'],
+        'missing': ['', 'NA', 'null', 'NaN', 'N/A', 'None'],
+    }
+    width = rng.randint(1, 5)
+    height = rng.randint(1, 20)
+    column_pools = []
+    for _ in range(width):
+        kinds = [rng.choice(['integer', 'float', 'boolean', 'string'])]
+        if rng.random() < 0.2:
+            # mostly mixed kinds fall back to text
+            kinds.append(rng.choice(['integer', 'float', 'boolean', 'string']))
+        if rng.random() < 0.5:
+            kinds.append('missing')
+        column_pools.append(kinds)
+    lines = [','.join(rng.choice(['col', 'Col', 'value', '', 'x']) for _ in range(width))]
+    for _ in range(height):
+        lines.append(','.join(rng.choice(pools[rng.choice(kinds)]) for kinds in column_pools))
+    return '\n'.join(lines)
+
+def parse_both(backend, data):
+    return [parse_outcome(backend, data, column_headers) for column_headers in (True, False)]
+
+
+@skipUnless(importlib.util.find_spec("pandas"), "pandas is not installed")
+class CSVBackendParityTests(SimpleTestCase):
+    def test_csv_backend_parity(self):
+        python_backend, pandas_backend = PythonCSVBackend(), PandasCSVBackend()
+        assert_parity(
+            self, CSV_TABLE_CASES, random_csv,
+            lambda data: parse_both(pandas_backend, data),
+            lambda data: parse_both(python_backend, data),
+            samples=300, seed=19,
+            matches=lambda left, right: all(columns_match(*pair) for pair in zip(left, right)),
+        )
+
+
+SITEMAP_ENTRY_CASES = [
+    {'location': 'https://example.com/'},
+    {'location': 'https://example.com/a?x=1&y=2', 'lastmod': date(2024, 2, 29)},
+    {
+        'location': 'https://example.com/<odd>"path"/',
+        'lastmod': datetime(2023, 12, 31, 23, 30, tzinfo=timezone.utc),
+        'changefreq': 'weekly',
+        'priority': 0.8,
+    },
+    {
+        'location': 'https://example.com/en/page/',
+        'alternates': [
+            {'lang_code': 'en', 'location': 'https://example.com/en/page/'},
+            {'lang_code': 'x-default', 'location': 'https://example.com/en/page/?a=1&b=2'},
+        ],
+    },
+    {'location': 'https://example.com/zero/', 'changefreq': '', 'priority': 0, 'alternates': []},
+    {'location': 'https://example.com/ünïcode/€', 'priority': '1.0'},
+]
+
+def random_url_entry(rng):
+    paths = ['', 'page', 'a&b', 'quote"s', "apos'", '<tag>', 'ünï', 'space here', '100%']
+    location = 'https://example.com/' + '/'.join(rng.choice(paths) for _ in range(rng.randint(0, 3)))
+    entry = {'location': location}
+    if rng.random() < 0.7:
+        entry['lastmod'] = timezone.now() - timedelta(days=rng.randint(0, 3650), seconds=rng.randint(0, 86400))
+    if rng.random() < 0.5:
+        entry['changefreq'] = rng.choice(['always', 'daily', 'monthly', None])
+    if rng.random() < 0.5:
+        entry['priority'] = rng.choice([0.1, 0.5, 1.0, '0.3', None])
+    if rng.random() < 0.6:
+        entry['alternates'] = [
+            {'lang_code': code, 'location': f'{location}?lang={code}&v=1'}
+            for code in rng.sample(['en', 'fr', 'de', 'es', 'x-default'], rng.randint(1, 4))
+        ]
+    return entry
+
+
+class SitemapEntryParityTests(SimpleTestCase):
+    def test_sitemap_entry_parity(self):
+        assert_parity(
+            self, SITEMAP_ENTRY_CASES, random_url_entry,
+            lambda url: render_to_string('sitemap.xml', {'urlset': [url]}),
+            lambda url: SITEMAP_HEADER + render_url_entry(**url) + SITEMAP_FOOTER,
+            samples=200, seed=1,
+        )
+
+    def test_sitemap_document_parity(self):
+        rng = random.Random(2)
+        urlset = SITEMAP_ENTRY_CASES + [random_url_entry(rng) for _ in range(50)]
+        self.assertEqual(
+            SITEMAP_HEADER + ''.join(render_url_entry(**url) for url in urlset) + SITEMAP_FOOTER,
+            render_to_string('sitemap.xml', {'urlset': urlset}),
+        )
@@ -1,43 +1,229 @@
+from collections import defaultdict
+
 from django.conf import settings
+from django.core.cache import cache
 from django.utils.functional import cached_property
-from wagtail.models import Locale
-from wagtail_localize.models import Translation, TranslationSource
+from wagtail.models import Locale, Page, Site
+from wagtail_localize.models import Translation
+
+from .locales import get_active_locale, get_all_locales, get_default_locale, get_locale
+
+# Seconds a translation lineage is cached for, cleared whenever a Translation is saved or deleted
+LINEAGE_CACHE_TIMEOUT = 60 * 60 * 24
+# translation_keys per query when prefetching alternates
+PREFETCH_BATCH_SIZE = 500
+
+
+def lineage_cache_key(translation_key):
+    return f"core.translations.lineage.{translation_key}"
+
+def invalidate_translation_lineage(translation_key):
+    """Drop the cached lineage for translation_key, call when its translations change"""
+    cache.delete(lineage_cache_key(translation_key))
+
+
+class TranslationLineage:
+    """
+    Translation tree for a translation_key: which locale each locale was translated from.
+    Built from a single query over the wagtail_localize Translation/TranslationSource rows and held in the cache,
+    predecessor/source/descendant lookups are then made in memory.
+    Nodes are locale ids, use get_translations_in_locales to fetch the objects.
+    """
+    def __init__(self, edges):
+        # edges are (source locale id, target locale id) in order of creation
+        self.predecessors = {}
+        self.children = defaultdict(list)
+        for source_locale_id, target_locale_id in edges:
+            # a locale can only have one predecessor, keep the first translation made into it
+            # and ignore any translation back into the locale's own ancestors
+            if target_locale_id in self.predecessors or target_locale_id in self._ancestors(source_locale_id):
+                continue
+            self.predecessors[target_locale_id] = source_locale_id
+            self.children[source_locale_id].append(target_locale_id)
+
+    def _ancestors(self, locale_id):
+        ancestors = [locale_id]
+        while locale_id in self.predecessors:
+            locale_id = self.predecessors[locale_id]
+            ancestors.append(locale_id)
+        return ancestors
+
+    @classmethod
+    def for_translation_key(cls, translation_key):
+        key = lineage_cache_key(translation_key)
+        edges = cache.get(key)
+        if edges is None:
+            edges = list(
+                Translation.objects
+                .filter(source__object_id=translation_key)
+                .order_by("created_at", "pk")
+                .values_list("source__locale_id", "target_locale_id")
+            )
+            cache.set(key, edges, LINEAGE_CACHE_TIMEOUT)
+        return cls(edges)
 
+    def predecessor(self, locale_id):
+        """Locale id the given locale was directly translated from, None if it is an original"""
+        return self.predecessors.get(locale_id)
+
+    def source(self, locale_id):
+        """Locale id of the original the given locale was (directly or indirectly) translated from"""
+        while locale_id in self.predecessors:
+            locale_id = self.predecessors[locale_id]
+        return locale_id
+
+    def direct_translations(self, locale_id):
+        """Locale ids directly translated from the given locale"""
+        return list(self.children.get(locale_id, []))
+
+    def levels(self, locale_id, max_depth=None):
+        """
+        Breadth-first generator of the locale ids translated from the given locale, one list per translation hop.
+        max_depth limits the number of hops (1 = direct translations only).
+        """
+        visited = {locale_id}
+        level = [locale_id]
+        depth = 0
+        while level and (max_depth is None or depth < max_depth):
+            level = [
+                child
+                for parent in level
+                for child in self.children.get(parent, [])
+                if child not in visited
+            ]
+            visited.update(level)
+            depth += 1
+            if level:
+                yield level
+
+    def translated(self, locale_id, max_depth=None):
+        """Locale ids translated (directly or indirectly) from the given locale, nearest first"""
+        return [child for level in self.levels(locale_id, max_depth) for child in level]
+
+
+def get_translation_lineage(item):
+    return getattr(item, "translation_lineage", None) or TranslationLineage.for_translation_key(item.translation_key)
+
+def get_translations_in_locales(item, locale_ids):
+    """
+    Return translations of item for each of locale_ids (in that order) from a single query.
+    Locales without a translation are skipped.
+    """
+    if not locale_ids:
+        return []
+    translations = {
+        translation.locale_id: translation
+        for translation in item.get_translation_model().objects.filter(
+            translation_key=item.translation_key, locale_id__in=locale_ids
+        )
+    }
+    return [translations[locale_id] for locale_id in locale_ids if locale_id in translations]
 
 def get_translation_predecessor(item):
     """ 
     Return object an item was directly translated from. Returns None if not translated or is original (source text).
     """
-    try:
-        translation_match = (
-            Translation.objects
-            .select_related('source') 
-            .get(source__object_id=item.translation_key, target_locale_id=item.locale.id)
-        )
-        return item.get_translation(translation_match.source.locale)
-    except Translation.DoesNotExist:
-        return None
+    locale_id = get_translation_lineage(item).predecessor(item.locale_id)
+    return item.get_translation_or_none(locale_id) if locale_id else None
     
 def get_translation_source(item):
     """ 
     Return the original (source) object an item was translated from.
     """
-    source = get_translation_predecessor(item)
-    if source:
-        return get_translation_source(source)
-    else:
+    locale_id = get_translation_lineage(item).source(item.locale_id)
+    if locale_id == item.locale_id:
         return item
+    return item.get_translation_or_none(locale_id) or item
+
+def iter_translated_items(item, max_depth=None, locales=None):
+    """
+    Breadth-first generator of items translated (directly or indirectly) from item, nearest translations first.
+    Each depth level is fetched with a single query when it is reached, stop iterating early to skip deeper levels.
+    max_depth limits the number of translation hops followed (1 = direct translations only).
+    locales (Locale instances or ids) limits the translations returned, the traversal still passes through other
+    locales to reach translations made from them.
+    """
+    locale_ids = None if locales is None else {getattr(locale, "pk", locale) for locale in locales}
+    for level in get_translation_lineage(item).levels(item.locale_id, max_depth):
+        if locale_ids is not None:
+            level = [locale_id for locale_id in level if locale_id in locale_ids]
+        yield from get_translations_in_locales(item, level)
+
+def get_translated_items(item, max_depth=None, locales=None):
+    """
+    Find all translated items with this instance as source (either directly or indirectly)
+    See iter_translated_items for max_depth and locales.
+    """
+    return list(iter_translated_items(item, max_depth, locales))
+
+def build_alternates(translations, site_root, default_language_code, default_url):
+    """
+    Return <link rel="alternate" ...> entries for a translations dict (lang-code/relative url pairs)
+    Urls are made absolute with site_root, x-default is the default locale translation, otherwise the first translation,
+    falling back to default_url if there are no translations.
+    """
+    alt = [
+        {"lang_code": key, "location": f"{site_root}{value}"}
+        for key, value in translations.items()
+    ]
+    x_default = translations.get(default_language_code)
+    if not x_default:
+        # doesn't exist in default locale, use the first locale in the translations
+        x_default = next(iter(translations.values()), default_url)
+    alt.append({"lang_code": "x-default", "location": f"{site_root}{x_default}"})
+    return alt
 
-def get_translated_items(item):
+def prefetch_alternates(pages, request=None):
     """
-    Recursively find all translated items with this instance as source (either directly or indirectly)
+    Populate the translations and alternates properties of each TranslatablePageMixin page in pages in bulk.
+    Live translations are read in batched queries (translation_key, locale, url_path) and grouped in memory, avoiding
+    the per-page translations, get_site() and Locale.get_default() queries when building sitemaps.
+    Pass the request to cache site root paths on it. Returns pages as a list.
     """
-    translated_items = item.direct_translations
-    for translation in translated_items:
-        translated_items.extend(get_translated_items(translation))
-    return translated_items
+    pages = list(pages)
+    translatable = [page for page in pages if isinstance(page, TranslatablePageMixin)]
+    if not translatable:
+        return pages
+
+    language_codes = {locale.pk: locale.language_code for locale in get_all_locales()}
+    default_language_code = get_default_locale().language_code
+    # page.url is relative unless there is more than one site
+    single_site = len({root_path.site_id for root_path in Site.get_site_root_paths()}) == 1
+
+    def url_parts(page):
+        parts = page.get_url_parts(request)
+        if parts is None or parts[1] is None and parts[2] is None:
+            return None, None
+        site_id, root_url, page_path = parts
+        return root_url, page_path if single_site else root_url + page_path
+
+    translation_keys = list({page.translation_key for page in translatable})
+    translations = defaultdict(dict)
+    # batched to stay under database parameter limits, all translations of a key are in the same batch
+    for start in range(0, len(translation_keys), PREFETCH_BATCH_SIZE):
+        for translation in (
+            Page.objects.live()
+            .filter(translation_key__in=translation_keys[start:start + PREFETCH_BATCH_SIZE])
+            .only("id", "url_path", "translation_key", "locale_id")
+            .order_by("path")
+            .iterator()
+        ):
+            translations[translation.translation_key][language_codes[translation.locale_id]] = url_parts(translation)[1]
+
+    for page in translatable:
+        site_root, url = url_parts(page)
+        page.translations = translations[page.translation_key]
+        page.alternates = build_alternates(page.translations, site_root, default_language_code, url)
+    return pages
 
 class ExtendedTranslatableMixin:
+    @cached_property
+    def translation_lineage(self):
+        """
+        Translation tree for this item's translation_key (see TranslationLineage)
+        """
+        return TranslationLineage.for_translation_key(self.translation_key)
+
     @cached_property
     def translation_predecessor(self):
         """ 
@@ -51,10 +237,7 @@ class ExtendedTranslatableMixin:
         """ 
         Return the source (origin) object this instance translated from. Returns self if not translated or is origin.
         """
-        if self.translation_predecessor == self:
-            return self
-        else:
-            return get_translation_source(self.translation_predecessor)
+        return get_translation_source(self)
 
     @property
     def direct_translations(self):
@@ -62,32 +245,15 @@ class ExtendedTranslatableMixin:
         Return all items that have been directly translated from the given source item.
         This only includes translations with the same translation_key that use item as their source.
         """
-        # Retrieve the translation source object for the item
-        try:
-            source = TranslationSource.objects.get(object_id=self.translation_key, locale_id=self.locale.id)
-        except TranslationSource.DoesNotExist:
-            return []  # No descendants if item has no translation source
-
-        # Find all translations linked to this source
-        translations = (
-            Translation.objects
-            .filter(source=source)
-            .select_related('target_locale')
-        )
+        return get_translations_in_locales(self, self.translation_lineage.direct_translations(self.locale_id))
 
-        # Retrieve each translated item in the target locales
-        return [
-            self.get_translation(translation.target_locale)
-            for translation in translations
-        ]
-        
-    
     @property
     def translated_items(self):
         """
-        Recursively find all translated items with this instance as source (either directly or indirectly)
+        Lazily find all translated items with this instance as source (either directly or indirectly), nearest first
+        Returns a generator, use iter_translated_items directly to limit depth or locales.
         """
-        return get_translated_items(self)
+        return iter_translated_items(self)
 
                 
 
@@ -115,7 +281,7 @@ class ExtendedTranslatableMixin:
             return self
 
         try:
-            locale = Locale.get_active()
+            locale = get_active_locale()
         except (LookupError, Locale.DoesNotExist):
             return self
 
@@ -137,7 +303,7 @@ class TranslatablePageMixin(ExtendedTranslatableMixin):
         Urls are relative.
         """
         return {
-            page.locale.language_code: page.url
+            get_locale(page.locale_id).language_code: page.url
             for page in self.get_translations(inclusive=True)
             .live()
             .defer_streamfields()
@@ -151,27 +317,19 @@ class TranslatablePageMixin(ExtendedTranslatableMixin):
         Convert translations urls to absolute urls instead of relative urls
         Add x-default value.
         """
-        site_root = self.get_site().root_url
-        alt = [
-            {"lang_code": key, "location": f"{site_root}{value}"}
-            for key, value in self.translations.items()
-        ]
-        x_default = self.translations.get(Locale.get_default().language_code)
-        if not x_default:
-            # doesn't exist in default locale, use the first locale in the translations
-            try:
-                x_default = list(self.translations.items())[0][1]
-            except:
-                x_default = self.url
-        alt.append({"lang_code": "x-default", "location": f"{site_root}{x_default}"})
-        return alt
-
-    def get_sitemap_urls(self):
+        return build_alternates(
+            self.translations,
+            self.get_site().root_url,
+            get_default_locale().language_code,
+            self.url,
+        )
+
+    def get_sitemap_urls(self, request=None):
         """
         Return sitemap entry for this page including alternates values
         """
         url_item = {
-            "location": self.full_url,
+            "location": self.get_full_url(request),
             "lastmod": self.last_published_at or self.latest_revision_created_at,
             "alternates": self.alternates,
         }
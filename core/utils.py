@@ -6,8 +6,9 @@ import io
 import math
 import os
 import re
-from collections import OrderedDict
+from dataclasses import dataclass
 from html import unescape
+from html.entities import html5
 from html.parser import HTMLParser
 
 from bs4 import BeautifulSoup
@@ -16,7 +17,7 @@ from django.utils.encoding import force_str
 from django.utils.translation import gettext_lazy as _
 from lxml import etree
 from PIL.ExifTags import GPSTAGS, TAGS
-from wagtail.blocks import ListBlock
+from wagtail.blocks import Block, ListBlock, StreamBlock, StructBlock
 from wagtail.blocks.stream_block import StreamValue
 from wagtail.models import Page
 
@@ -25,6 +26,184 @@ def page_url(slug, target=None):
     pg = Page.objects.filter(slug=slug).first()
     return f'{pg.url}{"#" + target if target else ""}' if pg else ''
 
+# Text extraction follows BeautifulSoup's html.parser tree builder so get_streamfield_text output is unchanged
+PRESERVE_WHITESPACE_TAGS = frozenset({"pre", "textarea"})
+VOID_TAGS = frozenset({
+    "area", "base", "basefont", "bgsound", "br", "col", "command", "embed", "frame", "hr", "image", "img",
+    "input", "isindex", "keygen", "link", "menuitem", "meta", "nextid", "param", "source", "spacer", "track", "wbr",
+})
+FONT_AWESOME_TEXT = re.compile(r"\bfa-[^ ]*")
+NEWLINES = re.compile(r"([\n]+.?)+")
+WORD_SLASH = re.compile(r"(?<=\D)/(?=\D)")
+FULL_STOP = re.compile(r"\.(?=\s)")
+PUNCTUATION = str.maketrans("", "", '!"#$%&\'()*+,-:;<=>?@[\\]^_`{|}~“”‘’–«»‹›¿¡')
+SPACES = re.compile(r" +")
+# Tokens of well formed markup, tokenised exactly as HTMLParser would: text, a literal &, a start tag
+# (name, self closing /), an end tag and a comment. Anything else (entities, stray <, doctypes) goes through HTMLParser.
+HTML_TOKEN = re.compile(
+    r"""([^<&]+)|(&)(?![a-zA-Z#])"""
+    r"""|<([a-zA-Z][^\t\n\r\f />\x00]*)(?:\s+[^\s/>"'=]+(?:\s*=\s*(?:"[^"]*"|'[^']*'|[^\s"'=<>`/]+(?=[\s>])))?)*\s*(/?)>"""
+    r"""|</\s*([a-zA-Z][-.a-zA-Z0-9:_]*)\s*>|<!--(.*?)--\s*>""",
+    re.DOTALL,
+)
+CDATA_END_TAGS = {tag: re.compile(rf"</\s*{tag}\s*>", re.IGNORECASE) for tag in HTMLParser.CDATA_CONTENT_ELEMENTS}
+
+
+class TextExtractor(HTMLParser):
+    """
+    Single pass html text extractor, collects the text nodes outside of skip_tags without building a tree.
+    Text nodes, whitespace handling and entity conversion match BeautifulSoup(html, "html.parser"),
+    so ' '.join(extractor.text) equals ' '.join(soup.findAll(text=True)) after extracting skip_tags.
+    """
+    def __init__(self, skip_tags=()):
+        super().__init__(convert_charrefs=False)
+        self.skip_tags = frozenset([skip_tags] if isinstance(skip_tags, str) else skip_tags or ())
+        self.text = []
+        self.data = []
+        self.stack = []
+        self.skipping = 0
+        self.preserving = 0
+        self.closed_void_tags = []
+
+    def feed_tokens(self, html):
+        """
+        Feed well formed html through HTML_TOKEN instead of HTMLParser, calling the same handlers.
+        Returns False at the first token HTMLParser is needed for, the extractor must then be discarded.
+        """
+        position, length = 0, len(html)
+        match = HTML_TOKEN.match
+        while position < length:
+            token = match(html, position)
+            if not token:
+                return False
+            text, ampersand, start, self_closing, end, comment = token.groups()
+            position = token.end()
+            if text is not None:
+                self.handle_data(text)
+            elif ampersand is not None:
+                self.handle_data(ampersand)
+            elif start is not None:
+                tag = start.lower()
+                if self_closing:
+                    self.handle_startendtag(tag, [])
+                    continue
+                self.handle_starttag(tag, [])
+                if tag in CDATA_END_TAGS:
+                    # script/style content is text up to the matching end tag
+                    close = CDATA_END_TAGS[tag].search(html, position)
+                    if not close:
+                        return False
+                    if close.start() > position:
+                        self.handle_data(html[position:close.start()])
+                    self.handle_endtag(tag)
+                    position = close.end()
+            elif end is not None:
+                self.handle_endtag(end.lower())
+            else:
+                self.handle_comment(comment)
+        return True
+
+    def end_data(self):
+        if not self.data:
+            return
+        data = "".join(self.data)
+        self.data = []
+        if not self.preserving and not data.strip(" \n\t\f\r"):
+            data = "\n" if "\n" in data else " "
+        if data and not self.skipping:
+            self.text.append(data)
+
+    def push(self, tag):
+        self.stack.append(tag)
+        self.skipping += tag in self.skip_tags
+        self.preserving += tag in PRESERVE_WHITESPACE_TAGS
+
+    def pop_to(self, tag):
+        # close the most recent open tag and anything opened after it, unmatched end tags are ignored
+        if tag not in self.stack:
+            return
+        while self.stack:
+            popped = self.stack.pop()
+            self.skipping -= popped in self.skip_tags
+            self.preserving -= popped in PRESERVE_WHITESPACE_TAGS
+            if popped == tag:
+                break
+
+    def handle_starttag(self, tag, attrs):
+        self.end_data()
+        self.push(tag)
+        if tag in VOID_TAGS:
+            self.end_data()
+            self.pop_to(tag)
+            self.closed_void_tags.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        # as BeautifulSoup, <tag/> closes through handle_endtag, which may match an earlier void tag instead
+        self.end_data()
+        self.push(tag)
+        self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag in self.closed_void_tags:
+            self.closed_void_tags.remove(tag)
+            return
+        self.end_data()
+        self.pop_to(tag)
+
+    def handle_data(self, data):
+        self.data.append(data)
+
+    def handle_charref(self, name):
+        number = int(name[1:], 16) if name[:1] in "xX" else int(name)
+        data = None
+        if number < 256:
+            try:
+                data = bytes([number]).decode("windows-1252")
+            except UnicodeDecodeError:
+                pass
+        if not data:
+            try:
+                data = chr(number)
+            except (ValueError, OverflowError):
+                pass
+        self.data.append(data or "\N{REPLACEMENT CHARACTER}")
+
+    def handle_entityref(self, name):
+        self.data.append(html5.get(f"{name};", f"&{name}"))
+
+    def handle_comment(self, data):
+        self.end_data()
+        self.data.append(data)
+        self.end_data()
+
+    def handle_decl(self, data):
+        self.end_data()
+        self.data.append(data[len("DOCTYPE "):])
+        self.end_data()
+
+    def unknown_decl(self, data):
+        self.end_data()
+        self.data.append(data[len("CDATA["):] if data.upper().startswith("CDATA[") else data)
+        self.end_data()
+
+    def handle_pi(self, data):
+        self.end_data()
+        self.data.append(data)
+        self.end_data()
+
+    def close(self):
+        super().close()
+        self.end_data()
+
+def extract_text(html, skip_tags=("style", "script", "code")):
+    """Text nodes of html (outside skip_tags) joined with spaces"""
+    extractor = TextExtractor(skip_tags)
+    if not extractor.feed_tokens(html):
+        extractor = TextExtractor(skip_tags)
+        extractor.feed(html)
+    extractor.close()
+    return " ".join(extractor.text)
+
 def get_streamfield_text(
     streamfield, 
     strip_newlines=True, 
@@ -32,45 +211,40 @@ def get_streamfield_text(
     lowercase=False,
     strip_tags=['style', 'script', 'code']
     ):
-    
-    html = streamfield.render_as_block()
-    soup = BeautifulSoup(unescape(html), "html.parser")
+    return get_html_text(streamfield.render_as_block(), strip_newlines, strip_punctuation, lowercase, strip_tags)
 
-    # strip unwanted tags tags (e.g. ['code', 'script', 'style'])
-    # <style> & <script> by default
-    if strip_tags:
-        for script in soup(strip_tags):
-            script.extract()
-
-    inner_text = ' '.join(soup.findAll(text=True))
+def get_html_text(
+    html, 
+    strip_newlines=True, 
+    strip_punctuation=True, 
+    lowercase=False,
+    strip_tags=['style', 'script', 'code']
+    ):
 
-    # replace &nbsp; with space
-    inner_text = inner_text.replace('\xa0',' ')
+    # text outside unwanted tags (e.g. ['code', 'script', 'style']), <style> & <script> by default
+    inner_text = extract_text(unescape(html), strip_tags)
 
-    # replace & with and
-    inner_text = inner_text.replace(' & ',' and ')
+    # replace &nbsp; with space, & with and
+    inner_text = inner_text.replace('\xa0',' ').replace(' & ',' and ')
 
     # strip font awesome text
-    inner_text = re.sub(r'\bfa-[^ ]*', '', inner_text)
+    inner_text = FONT_AWESOME_TEXT.sub('', inner_text)
 
     if strip_newlines:
-        inner_text = re.sub(r'([\n]+.?)+', ' ', inner_text)
+        inner_text = NEWLINES.sub(' ', inner_text)
 
     if strip_punctuation:
         # replace xx/yy with xx yy, leave fractions (1/2)
-        inner_text = re.sub(r'(?<=\D)/(?=\D)', ' ', inner_text)
+        inner_text = WORD_SLASH.sub(' ', inner_text)
         # strip full stops, leave decimal points and point separators
-        inner_text = re.sub(r'\.(?=\s)', '', inner_text)
-        punctuation = '!"#$%&\'()*+,-:;<=>?@[\\]^_`{|}~“”‘’–«»‹›¿¡'
-        inner_text = inner_text.translate(str.maketrans('', '', punctuation))
+        inner_text = FULL_STOP.sub('', inner_text)
+        inner_text = inner_text.translate(PUNCTUATION)
 
     if lowercase:
         inner_text = inner_text.lower()
 
     # strip excess whitespace
-    inner_text = re.sub(r' +', ' ', inner_text).strip()
-
-    return inner_text
+    return SPACES.sub(' ', inner_text).strip()
 
 def count_words(text):
     try:
@@ -112,18 +286,16 @@ def count_words(text):
         return -1
 
 def find_all_streamfields_with_css_class(css_class):
-    
-    found_pages = []
-    pages = Page.objects.all().specific()
+    """(page, field name) of each published StreamField emitting css_class, from the content index (see indexed_streamfields)"""
+    from .content_index import indexed_streamfields
+    from .models import ContentIndexEntry
+    return indexed_streamfields(ContentIndexEntry.CSS_CLASS, css_class)
 
-    for page in pages:
-
-        for item in page.__dict__.items():
-            if item[1].__class__ == StreamValue:
-                if stream_has_css_class(item[1], css_class): found_pages.append((page, item[0]))
-                print(page.title)
-    
-    return [*set(found_pages)]
+def find_all_streamfields_with_block(block_type):
+    """(page, field name) of each published StreamField using block_type, from the content index (see indexed_streamfields)"""
+    from .content_index import indexed_streamfields
+    from .models import ContentIndexEntry
+    return indexed_streamfields(ContentIndexEntry.BLOCK_TYPE, block_type)
 
 def stream_has_css_class(streamvalue, css_class):
     render = BeautifulSoup(streamvalue.render_as_block(), 'html.parser')
@@ -203,80 +375,76 @@ def decode_exif(exif_data):
     return decoded_data
 
 
-def list_block_instances(streamfield):
-    def list_bound_blocks(data):
-        list = []
-        bound_blocks = None
+@dataclass
+class BlockNode:
+    """A block found in a StreamField's raw data: path from the field, type name, block definition and raw value"""
+    path: tuple
+    type: str
+    block: Block
+    raw: object
+
+    def __iter__(self):
+        # unpacks as (path, type, block class)
+        return iter((self.path, self.type, type(self.block)))
+
+    @property
+    def block_class(self):
+        return f"{type(self.block).__module__}.{type(self.block).__name__}"
+
+    def bind(self):
+        """BoundBlock of the raw value, only converted (and chooser objects fetched) when asked for"""
+        return self.block.bind(self.block.to_python(self.raw))
+
+def walk_raw_blocks(block, raw, path=()):
+    """Yield a BlockNode for each descendant of block in its raw (JSON) value, depth first, in document order"""
+    if isinstance(block, StreamBlock):
+        for index, child in enumerate(raw or []):
+            child_block = block.child_blocks.get(child.get("type")) if isinstance(child, dict) else None
+            if child_block is None:
+                continue
+            yield BlockNode(path + (index,), child["type"], child_block, child.get("value"))
+            yield from walk_raw_blocks(child_block, child.get("value"), path + (index,))
+    elif isinstance(block, ListBlock):
+        for index, item in enumerate(raw or []):
+            value = item["value"] if block._item_is_in_block_format(item) else item
+            yield BlockNode(path + (index,), block.child_block.name or "item", block.child_block, value)
+            yield from walk_raw_blocks(block.child_block, value, path + (index,))
+    elif isinstance(block, StructBlock) and isinstance(raw, dict):
+        for name, child_block in block.child_blocks.items():
+            yield BlockNode(path + (name,), name, child_block, raw.get(name))
+            yield from walk_raw_blocks(child_block, raw.get(name), path + (name,))
+
+def walk_streamfield(streamfield):
+    """
+    Lazily walk the blocks of a StreamValue from its raw data, without rendering or converting any block value.
+    Each BlockNode unpacks as (path, type, block class), node.bind() gives the BoundBlock when it's needed.
+    """
+    return walk_raw_blocks(streamfield.stream_block, streamfield.raw_data)
 
-        if isinstance(data, StreamValue):
-            bound_blocks = data._bound_blocks
-        else:
-            value = getattr(data, "value", None)
-            if value:
-                bound_blocks = getattr(value, "bound_blocks", getattr(value, "_bound_blocks", None))
-
-        if not bound_blocks:
-            return None
-
-        if isinstance(bound_blocks, OrderedDict):
-            for key, value in bound_blocks.items():
-                child_blocks = list_bound_blocks(value)
-                item = {
-                    "type": key,
-                    "class": f"{value.block.__class__.__module__}.{value.block.__class__.__name__}",
-                }
-                if child_blocks:
-                    item["child_blocks"] = child_blocks
-                list += [item]
+def list_block_instances(streamfield):
+    """Nested list of {type, class, child_blocks} for the blocks of a StreamValue, None if it has none"""
+    items = {}
+    blocks = []
+    for node in walk_streamfield(streamfield):
+        item = {"type": node.type, "class": node.block_class}
+        items[node.path] = item
+        if len(node.path) == 1:
+            blocks.append(item)
         else:
-            for bound_block in bound_blocks:
-                if bound_block:
-                    item = {
-                        "type": bound_block.block.name,
-                        "class": f"{bound_block.block.__class__.__module__}.{bound_block.block.__class__.__name__}",
-                    }
-                    child_blocks = list_bound_blocks(bound_block)
-                    if child_blocks:
-                        item["child_blocks"] = child_blocks
-                    list += [item]
-        return list
-    
-    if streamfield.is_lazy: r = streamfield.render_as_block() # force lazy object to load
-    return list_bound_blocks(streamfield)
+            items[node.path[:-1]].setdefault("child_blocks", []).append(item)
+    return blocks or None
 
 def block_instances_by_class(streamfield, block_class):
-    def find_blocks(data, block_class):
-        list = []
-        bound_blocks = None
-
-        if isinstance(data, StreamValue):
-            bound_blocks = data._bound_blocks
-        else:
-            value = getattr(data, "value", None)
-            if value:
-                bound_blocks = getattr(value, "bound_blocks", getattr(value, "_bound_blocks", None))
-
-        if not bound_blocks:
-            return []
-
-        if isinstance(bound_blocks, OrderedDict):
-            bound_blocks = bound_blocks.values()
-    
-        for bound_block in bound_blocks:
-            if type(bound_block.block) is block_class: list += [bound_block]
-            list += find_blocks(bound_block, block_class)
-        return list
-
+    """BoundBlocks of every block of type block_class (a class or its dotted path) in a StreamValue"""
     if type(block_class)==str:
         try:
             module_name, class_name = block_class.rsplit('.', 1)
             module = importlib.import_module(module_name)
             block_class = getattr(module, class_name)().__class__
         except:
-            return ['Unable to parse class path. Try passing the class object instead.']    
-    if streamfield.is_lazy: r = streamfield.render_as_block() # force lazy object to load
+            return ['Unable to parse class path. Try passing the class object instead.']
 
-    return find_blocks(streamfield, block_class)
+    return [node.bind() for node in walk_streamfield(streamfield) if type(node.block) is block_class]
 
 def list_streamfield_blocks(streamfield):
     def list_child_blocks(child_blocks):
@@ -1,28 +1,45 @@
+import gzip
+import hashlib
+import re
 from datetime import datetime
 
-from django.template.response import TemplateResponse
+from django.conf import settings
+from django.core.cache import cache
+from django.http import FileResponse, Http404, HttpResponse
+from django.template.loader import render_to_string
+from django.utils.cache import get_conditional_response
 from django.utils.http import http_date
 from django.views.generic import TemplateView
 from wagtail.models import Page, Site
 
+from .sitemap import SITEMAP_CACHE_TIMEOUT, ShardedSiteMap, sitemap_cache_key
+from .translations import prefetch_alternates
 
-def sitemap(request):
-    site = Site.find_for_request(request)
-    urlset = []
-    for locale_home in (
-        site.root_page.get_translations(inclusive=True)
-        .live()
-        .defer_streamfields()
-        .specific()
-    ):
+re_accepts_gzip = re.compile(r"\bgzip\b")
+
+
+def render_sitemap(request, site):
+    """
+    Render the sitemap for site, return dict of content, gzip (pre-compressed content), etag and last_modified
+    """
+    pages = [
+        page
+        for locale_home in (
+            site.root_page.get_translations(inclusive=True)
+            .live()
+            .defer_streamfields()
+            .specific()
+        )
         for page in (
             locale_home.get_descendants(inclusive=True)
             .live()
             .defer_streamfields()
             .specific()
-        ):
-            if page.search_engine_index:
-                urlset.append(page.get_sitemap_urls())
+        )
+        if page.search_engine_index
+    ]
+    # resolve translations/alternates for all pages in bulk rather than per page
+    urlset = [page.get_sitemap_urls(request) for page in prefetch_alternates(pages, request)]
 
     try:
         urlset.remove([])
@@ -37,14 +54,83 @@ def sitemap(request):
         )
         last_modified = datetime.now()
 
-    return TemplateResponse(
-        request,
-        template="sitemap.xml",
-        context={"urlset": urlset},
+    content = render_to_string("sitemap.xml", {"urlset": urlset}, request).encode("utf-8")
+    return {
+        "content": content,
+        # mtime=0 keeps the compressed bytes (and so the etag) stable between renders
+        "gzip": gzip.compress(content, mtime=0),
+        "etag": hashlib.sha256(content).hexdigest(),
+        "last_modified": last_modified.timestamp(),
+    }
+
+
+def sitemap(request):
+    """
+    Serve the sitemap from the rendered bytes cached per site (invalidated by the page publish/unpublish/delete hooks)
+    Conditional requests (If-None-Match/If-Modified-Since) are answered with 304 without touching the page tree.
+    """
+    site = Site.find_for_request(request)
+    cache_key = sitemap_cache_key(site.pk)
+    rendered = cache.get(cache_key)
+    if rendered is None:
+        rendered = render_sitemap(request, site)
+        cache.set(cache_key, rendered, getattr(settings, "SITEMAP_CACHE_TIMEOUT", SITEMAP_CACHE_TIMEOUT))
+
+    # strong etag per representation, gzip and identity bodies differ
+    use_gzip = bool(re_accepts_gzip.search(request.META.get("HTTP_ACCEPT_ENCODING", "")))
+    etag = f'"{rendered["etag"]}-gzip"' if use_gzip else f'"{rendered["etag"]}"'
+    headers = {
+        "X-Robots-Tag": "noindex, noodp, noarchive",
+        "ETag": etag,
+        "last-modified": http_date(rendered["last_modified"]),
+        "vary": "Accept-Encoding",
+    }
+
+    not_modified = get_conditional_response(
+        request, etag=etag, last_modified=int(rendered["last_modified"])
+    )
+    if not_modified is not None:
+        for header, value in headers.items():
+            not_modified.headers[header] = value
+        return not_modified
+
+    if use_gzip:
+        headers["Content-Encoding"] = "gzip"
+    return HttpResponse(
+        rendered["gzip"] if use_gzip else rendered["content"],
+        content_type="application/xml",
+        headers=headers,
+    )
+
+
+def sitemap_index(request):
+    """
+    Serve the sitemap index written by ShardedSiteMap, generating it for the requested site if missing.
+    Only served with settings.SITEMAP_INDEX set, otherwise the publish hooks keep SiteMap up to date instead.
+    """
+    if not getattr(settings, "SITEMAP_INDEX", False):
+        raise Http404
+    sitemap = ShardedSiteMap()
+    if not sitemap.exists():
+        sitemap.generate_sitemap_from_site(Site.find_for_request(request), thread=False)
+    return FileResponse(
+        open(sitemap.sitemap_path, "rb"),
+        content_type="application/xml",
+        headers={"X-Robots-Tag": "noindex, noodp, noarchive"},
+    )
+
+
+def sitemap_shard(request, filename):
+    """
+    Serve a shard file listed in the sitemap index (settings.SITEMAP_INDEX only)
+    """
+    if not getattr(settings, "SITEMAP_INDEX", False):
+        raise Http404
+    path = ShardedSiteMap().shard_path(filename)
+    if not path:
+        raise Http404
+    return FileResponse(
+        open(path, "rb"),
         content_type="application/xml",
-        headers={
-            "X-Robots-Tag": "noindex, noodp, noarchive",
-            "last-modified": http_date(last_modified.timestamp()),
-            "vary": "Accept-Encoding",
-        },
+        headers={"X-Robots-Tag": "noindex, noodp, noarchive"},
     )
@@ -8,7 +8,7 @@ from wagtail.models import Page
 
 from .draftail_extensions import (DRAFTAIL_ICONS, register_block_feature,
                                   register_inline_styling)
-from .sitemap import SiteMap
+from .sitemap import get_sitemap, invalidate_sitemap_cache
 from .thumbnails import ThumbnailOperation
 from .utils import has_role, get_custom_icons
 
@@ -202,15 +202,17 @@ def register_admin_css():
 
 @hooks.register('after_publish_page')
 def add_page_sitemap_entry(request, page):
+    invalidate_sitemap_cache()
     if page.live and not page.view_restrictions.exists():
-        SiteMap().add_page(page)
+        get_sitemap().add_page(page)
     else:
-        SiteMap().remove_page(page)    
+        get_sitemap().remove_page(page)    
 
 @hooks.register('after_unpublish_page')
 @hooks.register('after_delete_page')
 def remove_page_sitemap_entry(request, page):
-    SiteMap().remove_page(page)    
+    invalidate_sitemap_cache()
+    get_sitemap().remove_page(page)    
 
 @hooks.register('register_image_operations')
 def register_image_operations():
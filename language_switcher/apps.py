@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class LanguageSwitcherConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "language_switcher"
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,29 @@
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from wagtail.models import Page
+from wagtail.signals import page_published, page_slug_changed, page_unpublished, post_page_move
+
+from .templatetags.switcher_tags import invalidate_language_switcher, invalidate_language_switchers
+from .url_index import invalidate_url_index, invalidate_url_index_page
+
+
+@receiver(page_published)
+@receiver(page_unpublished)
+def clear_page_urls(sender, instance, **kwargs):
+    invalidate_url_index_page(instance)
+    invalidate_language_switcher(instance)
+
+
+@receiver(post_page_move)
+@receiver(page_slug_changed)
+def clear_branch_urls(sender, instance, **kwargs):
+    # url paths of the whole branch have changed
+    invalidate_url_index()
+    invalidate_language_switchers()
+
+
+@receiver(post_delete)
+def clear_deleted_page_urls(sender, instance, **kwargs):
+    if isinstance(instance, Page):
+        invalidate_url_index()
+        invalidate_language_switchers()
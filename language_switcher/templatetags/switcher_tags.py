@@ -1,9 +1,40 @@
+from uuid import uuid4
+
 from django import template
+from django.conf import settings
+from django.core.cache import cache
 from wagtail.contrib.routable_page.models import RoutablePageMixin
-from wagtail.models import Locale
+
+from core.locales import get_active_locale, get_all_locales, get_locale, get_locale_registry
 
 register = template.Library()
 
+# Seconds a switcher payload is cached for, cleared as pages are published, unpublished, moved or deleted
+SWITCHER_CACHE_TIMEOUT = getattr(settings, "SWITCHER_CACHE_TIMEOUT", 60 * 60 * 24)
+SWITCHER_CACHE_VERSION_KEY = "language_switcher.payload"
+
+
+def switcher_cache_version():
+    return cache.get_or_set(SWITCHER_CACHE_VERSION_KEY, lambda: uuid4().hex, None)
+
+def switcher_cache_key(translation_key, locale_id, version=None):
+    # the registry version changes whenever locales are added, edited or removed
+    return (
+        f"language_switcher.{get_locale_registry().version}.{version or switcher_cache_version()}"
+        f".{translation_key}.{locale_id}"
+    )
+
+def invalidate_language_switchers():
+    """Drop every cached switcher payload, needed when url paths change for a page branch (move, slug change, delete)"""
+    cache.set(SWITCHER_CACHE_VERSION_KEY, uuid4().hex, None)
+
+def invalidate_language_switcher(page):
+    """Drop the cached switcher payloads of page and its translations for every locale"""
+    version = switcher_cache_version()
+    cache.delete_many(
+        [switcher_cache_key(page.translation_key, locale.pk, version) for locale in get_all_locales()]
+    )
+
 def get_routable_subpage_url(page, context):
     # if routable page, construct translated routable url
     # the kwargs will be untranslated, you will need to handle the localization in the 
@@ -15,6 +46,25 @@ def get_routable_subpage_url(page, context):
     else:
         return ''
 
+def build_switcher_payload(page, current_lang):
+    """
+    Request independent switcher data for page (or a non-Wagtail view if page is None) in the current locale.
+    Alternatives hold the absolute url of the page translation in 'next', None if there is no translation.
+    """
+    alternates = {item['lang_code']: item['location'] for item in page.alternates} if page else {}
+    return {
+        'current': current_lang.pk,
+        'alternatives': [
+            {
+                'name': locale.get_display_name(),
+                'code': locale.language_code,
+                'next': alternates.get(locale.language_code),
+            }
+            for locale in get_all_locales()
+            if locale != current_lang
+        ],
+    }
+
 @register.simple_tag(takes_context=True)
 def language_switcher(context):
     # Build the language switcher
@@ -23,41 +73,29 @@ def language_switcher(context):
     #     path('lang/<str:language_code>/', set_language_from_url),
     # if no ?next= param passed to the view, it will attempt to determine best url from HTTP_REFERER
     # this will happen if non-Wagtail page is served, or if Wagtail page has no translation
+    # the payload is cached per page translation_key and active locale, only the routable page suffix
+    #   depends on the request and is added here
 
-    current_lang = Locale.get_active()
-    switcher = {'alternatives': []}
-
+    current_lang = get_active_locale()
     page = context.get('page', False)
-    if page:
-        for locale in Locale.objects.all():
-            if locale == current_lang: 
-                switcher['current'] = locale
-            else: # add the link to switch language 
-                next_url = next((item for item in page.alternates if item['lang_code'] == locale.language_code), None)
-                if next_url:
-                    next_url = next_url['location']
-                    if isinstance(page, RoutablePageMixin):
-                        next_url += context['request'].path.replace(page.url, '')
-                    next_url = f'?next={next_url}'
-                
-                switcher['alternatives'].append(
-                    {
-                        'name': locale.get_display_name(), 
-                        'code': locale.language_code,
-                        'url': f'/lang/{locale.language_code}/{next_url}'
-                    }
-                )
-    else:
-        for locale in Locale.objects.all():            
-            if locale == current_lang: 
-                switcher['current'] = locale
-            else:
-                switcher['alternatives'].append(
-                    {
-                        'name': locale.get_display_name(), 
-                        'code': locale.language_code,
-                        'url': f'/lang/{locale.language_code}/'
-                    }
-            )
-    return switcher
+    cache_key = switcher_cache_key(page.translation_key if page else None, current_lang.pk)
+    payload = cache.get(cache_key)
+    if payload is None:
+        payload = build_switcher_payload(page, current_lang)
+        cache.set(cache_key, payload, SWITCHER_CACHE_TIMEOUT)
+
+    suffix = ''
+    if isinstance(page, RoutablePageMixin):
+        suffix = context['request'].path.replace(page.url, '')
 
+    switcher = {'current': get_locale(payload['current']), 'alternatives': []}
+    for item in payload['alternatives']:
+        next_url = f"?next={item['next']}{suffix}" if item['next'] else ''
+        switcher['alternatives'].append(
+            {
+                'name': item['name'], 
+                'code': item['code'],
+                'url': f"/lang/{item['code']}/{next_url}"
+            }
+        )
+    return switcher
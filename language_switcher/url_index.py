@@ -0,0 +1,130 @@
+import threading
+import time
+from collections import OrderedDict
+from hashlib import sha1
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from wagtail.models import Page
+
+from core.locales import get_locale
+
+# Seconds index entries are cached for, entries are dropped as pages are published, unpublished, moved or deleted
+URL_INDEX_TIMEOUT = getattr(settings, "LANGUAGE_SWITCHER_INDEX_TIMEOUT", 60 * 60 * 24)
+URL_INDEX_VERSION_KEY = "language_switcher.url_index"
+# Referer paths with no page are remembered in process only, a client can send any number of them.
+# Held for URL_INDEX_MISS_TIMEOUT seconds so a page created at the path in another process is found soon after.
+URL_INDEX_MISS_CACHE_SIZE = getattr(settings, "LANGUAGE_SWITCHER_INDEX_MISS_CACHE_SIZE", 1024)
+URL_INDEX_MISS_TIMEOUT = getattr(settings, "LANGUAGE_SWITCHER_INDEX_MISS_TIMEOUT", 60)
+
+_misses = OrderedDict()
+_lock = threading.Lock()
+
+
+def url_index_version():
+    return cache.get_or_set(URL_INDEX_VERSION_KEY, lambda: uuid4().hex, None)
+
+def url_index_key(kind, value, version=None):
+    # url paths can hold characters that are not valid in cache keys
+    digest = sha1(str(value).encode()).hexdigest()
+    return f"language_switcher.url_index.{version or url_index_version()}.{kind}.{digest}"
+
+def invalidate_url_index():
+    """Drop the whole index, needed when url paths change for a page branch (move, slug change, delete)"""
+    with _lock:
+        _misses.clear()
+    cache.set(URL_INDEX_VERSION_KEY, uuid4().hex, None)
+
+def invalidate_url_index_page(page):
+    """Drop the index entries of a single page, call when it is published or unpublished"""
+    with _lock:
+        _misses.pop(page.url_path, None)
+    version = url_index_version()
+    cache.delete_many(
+        [
+            url_index_key("path", page.url_path, version),
+            url_index_key("translations", page.translation_key, version),
+        ]
+    )
+
+def is_url_path_miss(url_path):
+    with _lock:
+        expires = _misses.get(url_path)
+        if expires is None:
+            return False
+        if expires < time.monotonic():
+            del _misses[url_path]
+            return False
+        _misses.move_to_end(url_path)
+        return True
+
+def add_url_path_miss(url_path):
+    with _lock:
+        _misses[url_path] = time.monotonic() + URL_INDEX_MISS_TIMEOUT
+        _misses.move_to_end(url_path)
+        while len(_misses) > URL_INDEX_MISS_CACHE_SIZE:
+            _misses.popitem(last=False)
+
+def get_url_path_entry(url_path, version=None):
+    """
+    Index entry (page_id, translation_key, depth, ancestor translation keys nearest first) for the page at url_path.
+    Ancestors stop at the locale home pages (depth 2). Returns False if there is no page at url_path.
+    Only entries for existing pages go to the shared cache, misses are held in a small in-process LRU.
+    """
+    if is_url_path_miss(url_path):
+        return False
+    key = url_index_key("path", url_path, version)
+    entry = cache.get(key)
+    if entry is None:
+        page = Page.objects.filter(url_path=url_path).only("id", "path", "depth", "translation_key").first()
+        if not page:
+            add_url_path_miss(url_path)
+            return False
+        ancestor_keys = (
+            page.get_ancestors()
+            .filter(depth__gte=2)
+            .order_by("-depth")
+            .values_list("translation_key", flat=True)
+        )
+        entry = (page.pk, page.translation_key, page.depth, list(ancestor_keys))
+        cache.set(key, entry, URL_INDEX_TIMEOUT)
+    return entry
+
+def get_translation_urls(translation_keys, version=None):
+    """
+    Return {translation_key: {language_code: url}} for the live pages of each translation key.
+    Keys missing from the cache are loaded with a single query. Urls are relative, as page.url.
+    """
+    version = version or url_index_version()
+    keys = {translation_key: url_index_key("translations", translation_key, version) for translation_key in translation_keys}
+    cached = cache.get_many(keys.values())
+    urls = {translation_key: cached[key] for translation_key, key in keys.items() if key in cached}
+
+    missing = {translation_key: {} for translation_key in keys if translation_key not in urls}
+    if missing:
+        for page in (
+            Page.objects.live()
+            .only("id", "url_path", "translation_key", "locale_id")
+            .filter(translation_key__in=missing)
+        ):
+            locale = get_locale(page.locale_id)
+            if locale:
+                missing[page.translation_key][locale.language_code] = page.url
+        cache.set_many({keys[translation_key]: value for translation_key, value in missing.items()}, URL_INDEX_TIMEOUT)
+        urls.update(missing)
+    return urls
+
+def find_translated_url(url_path, language_code):
+    """
+    Url of the language_code translation of the page at url_path, or of its closest translated ancestor.
+    Returns "/" if no ancestor is translated and None if there is no page at url_path.
+    """
+    version = url_index_version()
+    entry = get_url_path_entry(url_path, version)
+    if not entry:
+        return None
+    page_id, translation_key, depth, ancestor_keys = entry
+    keys = [translation_key] + ancestor_keys
+    urls = get_translation_urls(keys, version)
+    return next((urls[key][language_code] for key in keys if language_code in urls[key]), "/")
@@ -3,7 +3,10 @@ from django.conf import settings
 from django.http import HttpResponseRedirect
 from django.utils import translation
 from urllib.parse import urlparse
-from wagtail.models import Page, Locale
+
+from core.locales import get_locale_registry
+
+from .url_index import find_translated_url
 
 
 def set_language_from_url(request, language_code):
@@ -11,9 +14,8 @@ def set_language_from_url(request, language_code):
     # if no next url supplied, will attempt to find it from referring url
     # if fails that, will send to home page of the language_code
     # if requested language is not a registered locale, send to home page
-    try:
-        requested_locale = Locale.objects.get(language_code=language_code)
-    except Locale.DoesNotExist:
+    requested_locale = get_locale_registry().by_language_code.get(language_code)
+    if requested_locale is None:
         return HttpResponseRedirect("/")
 
     # if /?next= missing from referring url, attempt to translate
@@ -37,21 +39,15 @@ def find_next_url(request, requested_locale):
         # get the full path of the referring page;
         previous = request.META["HTTP_REFERER"]
 
-        try:
-            # split off the path of the previous page
-            prev_path = urlparse(previous).path
-            # Your locale home pages must have the language code as the slug for the following line to work
-            # url_path uses the locale home page slug instead of the language code used in the resolved url
-            prev_page = Page.objects.get(url_path=prev_path).specific
-
-            # Find translation of referring page
-            # Walk up page tree to find closest translation if nothing matches
-            next_page = prev_page.translations.get(requested_locale.language_code)
-            next_url = next_page or find_closest_translation(
-                prev_page, requested_locale
-            )
+        # split off the path of the previous page
+        prev_path = urlparse(previous).path
+        # Your locale home pages must have the language code as the slug for the following line to work
+        # url_path uses the locale home page slug instead of the language code used in the resolved url
+        # Find translation of referring page from the url_path index
+        # Walk up page tree to find closest translation if nothing matches
+        next_url = find_translated_url(prev_path, requested_locale.language_code)
 
-        except Page.DoesNotExist:
+        if next_url is None:
             # previous page is not a Wagtail Page, try if previous path can be translated by
             # changing the language code
             next_url = urls.translate_url(previous, requested_locale.language_code)
@@ -66,11 +62,3 @@ def find_next_url(request, requested_locale):
         next_url = "/"
 
     return next_url
-
-
-def find_closest_translation(page, locale):
-    parent = page.get_parent().specific
-    next_page = parent.translations.get(locale.language_code)
-    return next_page or (
-        find_closest_translation(parent, locale) if parent.depth >= 3 else "/"
-    )
@@ -0,0 +1,237 @@
+import logging
+from collections import defaultdict
+from uuid import uuid4
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db.models import Q
+from wagtail.blocks import (ListBlock, PageChooserBlock, StaticBlock,
+                            StreamBlock, StructBlock)
+from wagtail.images.blocks import ImageChooserBlock
+from wagtail.models import Page, ReferenceIndex
+
+from blocks.links import LinkBlock, resolve_links
+from core.locales import get_active_locale
+
+from .icons import get_menu_icon
+from .models import Menu
+
+# Seconds a compiled menu is cached for, cleared when a menu or a page it links to is published
+MENU_CACHE_TIMEOUT = getattr(settings, "MENU_CACHE_TIMEOUT", 60 * 60 * 24)
+MENU_CACHE_VERSION_KEY = "menu.compiled"
+# compiled menus held in process, keyed by (version, slug, locale id, revision)
+MENU_PROCESS_CACHE_SIZE = 64
+_compiled_menus = {}
+
+
+def menu_cache_version():
+    return cache.get_or_set(MENU_CACHE_VERSION_KEY, lambda: uuid4().hex, None)
+
+def invalidate_compiled_menus():
+    """Drop every compiled menu in this and (via the shared version) every other process"""
+    _compiled_menus.clear()
+    cache.set(MENU_CACHE_VERSION_KEY, uuid4().hex, None)
+
+def menu_references_page(*pages):
+    """True if any menu links to one of pages or their translations"""
+    translation_keys = [page.translation_key for page in pages if page]
+    page_ids = Page.objects.filter(translation_key__in=translation_keys).values_list("id", flat=True)
+    return ReferenceIndex.objects.filter(
+        base_content_type=ContentType.objects.get_for_model(Menu),
+        to_content_type=ContentType.objects.get_for_model(Page),
+        to_object_id__in=[str(page_id) for page_id in page_ids],
+    ).exists()
+
+def menu_references_image(image):
+    """True if any menu uses image, as an icon or brand logo"""
+    return ReferenceIndex.objects.filter(
+        base_content_type=ContentType.objects.get_for_model(Menu),
+        to_content_type=ContentType.objects.get_for_model(type(image)),
+        to_object_id=str(image.pk),
+    ).exists()
+
+def load_menu_object(menu_slug):
+    """Menu instance for menu_slug in the active locale (falls back to the first match)"""
+    menu = Menu.objects.filter(slug=menu_slug).first()
+    try:
+        return menu.localized
+    except:
+        return menu
+
+def compile_page(page):
+    """Request independent details of a (localized) page chooser value"""
+    if not page:
+        return None
+    if getattr(settings, "WAGTAIL_I18N_ENABLED", False):
+        page = page.localized
+    return {
+        'id': page.pk,
+        'path': page.path,
+        'depth': page.depth,
+        'title': page.title,
+        'url': page.url,
+        'restricted': page.get_view_restrictions().exists(),
+    }
+
+def compile_block(block, value):
+    """
+    Plain, picklable equivalent of a menu block value.
+    Links are resolved to url/text, icons to markup and pages to their localized details,
+    stream and list children are compiled to items (see compile_item).
+    """
+    if isinstance(block, StreamBlock):
+        return [compile_item(child.block, child.value, child.block_type) for child in value]
+    if isinstance(block, ListBlock):
+        return [compile_item(block.child_block, child, 'item') for child in value]
+    if isinstance(block, LinkBlock):
+        return {'url': value.url(), 'text': value.text()}
+    if isinstance(block, StructBlock):
+        return {name: compile_block(block.child_blocks[name], child) for name, child in value.items()}
+    if isinstance(block, ImageChooserBlock):
+        return get_menu_icon(value)
+    if isinstance(block, PageChooserBlock):
+        return compile_page(value)
+    if isinstance(block, StaticBlock):
+        return None
+    return value
+
+def compile_item(block, value, block_type):
+    """Compiled stream/list child: the block type, the template to render it with and the compiled value"""
+    return {
+        'type': block_type,
+        'template': getattr(block.meta, 'template', None),
+        'value': compile_block(block, value),
+    }
+
+def iter_autofill_blocks(items):
+    """Compiled autofill submenu values in a list of compiled items (including nested submenus), in document order"""
+    for item in items or []:
+        value = item.get('value') if isinstance(item, dict) else None
+        if not isinstance(value, dict):
+            continue
+        if 'parent_page' in value and 'max_items' in value:
+            yield value
+        for child in value.values():
+            if isinstance(child, list):
+                yield from iter_autofill_blocks(child)
+
+def resolve_autofill_links(blocks, authenticated):
+    """
+    Return the links (title/url dicts) of each compiled autofill block in blocks.
+    Children of all parent pages are fetched with a single query, then filtered, ordered and limited per block.
+    Urls come from page.url, which uses the cached site root paths.
+    """
+    parents = {
+        (block['parent_page']['path'], block['parent_page']['depth']) 
+        for block in blocks if block.get('parent_page')
+    }
+    children = defaultdict(list)
+    if parents:
+        query = Q()
+        for path, depth in parents:
+            query |= Q(path__startswith=path, depth=depth + 1)
+        pages = Page.objects.live().filter(query)
+        # return only public pages if user not authenticated
+        if not authenticated:
+            pages = pages.public()
+        for page in pages.only(
+            'id', 'title', 'path', 'depth', 'url_path', 'show_in_menus', 'first_published_at', 'last_published_at'
+        ):
+            children[page.path[:-Page.steplen]].append(page)
+
+    links = []
+    for block in blocks:
+        block_links = []
+        parent_page = block.get('parent_page')
+        if parent_page:
+            # include parent page if selected and if matches restriction (just assume exists=private here)
+            if block['include_parent_page'] and (not parent_page['restricted'] or authenticated):
+                block_links.append({'title': parent_page['title'], 'url': parent_page['url']})
+
+            pages = children[parent_page['path']]
+            # filter by 'Show in Menus' if selected
+            if block['only_show_in_menus']:
+                pages = [page for page in pages if page.show_in_menus]
+            field = block['order_by'].lstrip('-')
+            pages = sorted(
+                pages,
+                key=lambda page: (getattr(page, field) is not None, getattr(page, field) or 0),
+                reverse=block['order_by'].startswith('-'),
+            )
+            block_links += [{'title': page.title, 'url': page.url} for page in pages[:block['max_items']]]
+        links.append(block_links)
+    return links
+
+def get_autofill_links(menu, authenticated):
+    """
+    Links for every autofill block of a compiled menu (indexed by the block's autofill_index).
+    Cached with the compiled menu, separately for logged in and anonymous users.
+    """
+    key = f"menu.autofill.{menu['cache_key']}.{bool(authenticated)}" if menu.get('cache_key') else None
+    links = cache.get(key) if key else None
+    if links is None:
+        links = resolve_autofill_links(list(iter_autofill_blocks(menu['items'])), authenticated)
+        if key:
+            cache.set(key, links, MENU_CACHE_TIMEOUT)
+    return links
+
+def compile_menu(menu):
+    """
+    Resolve a Menu into a tree of plain dicts with the same shape the menu templates use.
+    Everything that does not depend on the request is resolved here, visibility (display_when),
+    active links and autofill children are left to the menu_tags at render time.
+    """
+    if not menu:
+        return None
+    brand_logo = None
+    if menu.brand_logo:
+        try:
+            logo = menu.brand_logo.get_rendition('original')
+            brand_logo = {'url': logo.url, 'alt': logo.alt}
+        except Exception as e:
+            logging.error(
+                f"{type(e).__name__} at line {e.__traceback__.tb_lineno} of {__file__}: {e}"
+            )
+    items = compile_block(menu.items.stream_block, resolve_links(menu.items))
+    for index, block in enumerate(iter_autofill_blocks(items)):
+        block['autofill_index'] = index
+    return {
+        'slug': menu.slug,
+        'breakpoint': menu.breakpoint,
+        'brand_title': menu.brand_title,
+        'brand_logo': brand_logo,
+        'items': items,
+    }
+
+def get_compiled_menu(menu_slug):
+    """
+    Compiled menu for menu_slug in the active locale, held in process and in the Django cache.
+    Keyed by (slug, locale, live revision), the menu row is only read when the revision is not cached.
+    """
+    version = menu_cache_version()
+    locale_id = get_active_locale().pk
+    revision_key = f"menu.revision.{version}.{menu_slug}.{locale_id}"
+    revision = cache.get(revision_key)
+
+    compiled = None
+    if revision is not None:
+        key = (version, menu_slug, locale_id, revision)
+        if key in _compiled_menus:
+            return _compiled_menus[key]
+        compiled = cache.get(f"menu.compiled.{version}.{menu_slug}.{locale_id}.{revision}")
+
+    if compiled is None:
+        menu = load_menu_object(menu_slug)
+        revision = (menu.live_revision_id or 0) if menu else 0
+        compiled = compile_menu(menu)
+        if compiled:
+            # identifies this compiled menu for the autofill links cache
+            compiled['cache_key'] = f"{version}.{menu_slug}.{locale_id}.{revision}"
+        cache.set(f"menu.compiled.{version}.{menu_slug}.{locale_id}.{revision}", compiled, MENU_CACHE_TIMEOUT)
+        cache.set(revision_key, revision, MENU_CACHE_TIMEOUT)
+
+    if len(_compiled_menus) >= MENU_PROCESS_CACHE_SIZE:
+        _compiled_menus.clear()
+    _compiled_menus[(version, menu_slug, locale_id, revision)] = compiled
+    return compiled
@@ -0,0 +1,71 @@
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils.safestring import mark_safe
+
+from core.utils import strip_svg_markup
+
+# Maximum number of rendered icons held in process, least recently used icons are evicted first
+MENU_ICON_CACHE_SIZE = getattr(settings, "MENU_ICON_CACHE_SIZE", 256)
+MENU_ICON_RENDITION = 'fill-25x25|format-png'
+# collection the menu icon chooser is limited to, icons in it are rendered when saved
+MENU_ICON_COLLECTION = 'Menu Icons'
+
+_icons = OrderedDict()
+_lock = threading.Lock()
+
+
+def is_svg(image):
+    return image.filename[-4:].lower()==".svg"
+
+def menu_icon_key(image, rendition_token=MENU_ICON_RENDITION):
+    # svg icons are inlined, the rendition spec doesn't apply to them
+    return (image.pk, image.file_hash, None if is_svg(image) else rendition_token)
+
+def render_menu_icon(image, rendition_token=MENU_ICON_RENDITION):
+    """Inline svg markup for svg images, <img> tag for a rendition of other images"""
+    if is_svg(image):
+        svg_file = image.file.file
+        if svg_file.closed: svg_file.open()
+        svg = svg_file.read().decode('utf-8')
+        svg_file.close()
+        return mark_safe(strip_svg_markup(svg))
+    else:
+        r = image.get_rendition(rendition_token)
+        return mark_safe(r.img_tag())
+
+def get_menu_icon(image, rendition_token=MENU_ICON_RENDITION):
+    """
+    Icon markup for image from the in-process LRU cache, keyed by (image id, file hash, rendition spec).
+    Rendered with render_menu_icon on a miss.
+    """
+    if not image:
+        return ''
+    key = menu_icon_key(image, rendition_token)
+    with _lock:
+        if key in _icons:
+            _icons.move_to_end(key)
+            return _icons[key]
+    markup = render_menu_icon(image, rendition_token)
+    with _lock:
+        _icons[key] = markup
+        while len(_icons) > MENU_ICON_CACHE_SIZE:
+            _icons.popitem(last=False)
+    return markup
+
+def prime_menu_icon(image):
+    """
+    Drop cached icons of a saved image and render it again if it is a menu icon.
+    Menu icons are images in the menu icon collection or images that were already cached.
+    Returns True if the image is a menu icon.
+    """
+    with _lock:
+        stale = [key for key in _icons if key[0] == image.pk]
+        for key in stale:
+            del _icons[key]
+    collection = getattr(image, 'collection', None)
+    if stale or (collection and collection.name == MENU_ICON_COLLECTION):
+        get_menu_icon(image)
+        return True
+    return False
@@ -0,0 +1,48 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from wagtail.images import get_image_model
+from wagtail.models import PageViewRestriction
+from wagtail.signals import (page_published, page_slug_changed,
+                             page_unpublished, post_page_move, published,
+                             unpublished)
+
+from .compiled import (invalidate_compiled_menus, menu_references_image,
+                       menu_references_page)
+from .icons import prime_menu_icon
+from .models import Menu
+
+
+@receiver(published, sender=Menu)
+@receiver(unpublished, sender=Menu)
+@receiver(post_delete, sender=Menu)
+def clear_compiled_menus(sender, instance, **kwargs):
+    invalidate_compiled_menus()
+
+
+@receiver(page_published)
+@receiver(page_unpublished)
+def clear_compiled_menus_for_page(sender, instance, **kwargs):
+    # only menus linking to the page, or autofilling from its parent, are affected
+    if menu_references_page(instance, instance.get_parent()):
+        invalidate_compiled_menus()
+
+
+@receiver(post_page_move)
+@receiver(page_slug_changed)
+def clear_compiled_menus_for_branch(sender, instance, **kwargs):
+    # urls of the whole branch have changed, any menu link below it may be stale
+    invalidate_compiled_menus()
+
+
+@receiver(post_save, sender=PageViewRestriction)
+@receiver(post_delete, sender=PageViewRestriction)
+def clear_compiled_menus_for_restriction(sender, instance, **kwargs):
+    # restrictions are compiled into menus and split the autofill links cache, and apply to the whole branch
+    invalidate_compiled_menus()
+
+
+@receiver(post_save, sender=get_image_model())
+def refresh_menu_icon(sender, instance, **kwargs):
+    # compiled menus hold icon markup and the brand logo rendition url
+    if prime_menu_icon(instance) or menu_references_image(instance):
+        invalidate_compiled_menus()
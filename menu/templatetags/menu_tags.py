@@ -1,17 +1,30 @@
 from django import template
 from django.utils.safestring import mark_safe
 
-from core.utils import strip_svg_markup
-from menu.models import Menu
+from menu.compiled import (compile_menu, get_autofill_links, get_compiled_menu,
+                           resolve_autofill_links)
+from menu.icons import get_menu_icon
 
 register = template.Library()
 
 @register.simple_tag()
 def load_menu(menu_slug):
-    try:
-        return Menu.objects.filter(slug=menu_slug).first().localized
-    except:
-        return Menu.objects.filter(slug=menu_slug).first()
+    # compiled menu, see menu.compiled
+    return get_compiled_menu(menu_slug)
+
+@register.simple_tag()
+def preview_menu(menu):
+    # compile a (draft) menu instance without caching it
+    return compile_menu(menu)
+
+@register.simple_tag(takes_context=True)
+def render_menu_item(context, item, **kwargs):
+    # {% include_block %} equivalent for compiled menu items, renders the block template with self=item value
+    if not item or not item.get('template'):
+        return ''
+    menu_template = context.template.engine.get_template(item['template'])
+    with context.push({'self': item['value'], 'value': item['value'], **kwargs}):
+        return menu_template.render(context)
    
 @register.filter()
 def show_on_menu(item, request):
@@ -24,67 +37,45 @@ def show_on_menu(item, request):
 @register.simple_tag(takes_context=True)
 def link_active(context, link):
     try:
-        return ' active' if link.url() == context['request'].path else ''
+        return ' active' if link['url'] == context['request'].path else ''
     except:
         return ''
 
 @register.simple_tag()
 @mark_safe
 def menu_icon(image, redition_token='fill-25x25|format-png'):
-    if image:
-        if image.filename[-4:].lower()==".svg":
-            svg_file = image.file.file
-            if svg_file.closed: svg_file.open()
-            svg = svg_file.read().decode('utf-8')
-            svg_file.close()
-            return strip_svg_markup(svg)
-        else:
-            r = image.get_rendition(redition_token)
-            return r.img_tag()
-    return ''
+    # compiled menus hold the icon markup already
+    if isinstance(image, str):
+        return image
+    return get_menu_icon(image, redition_token)
 
 @register.simple_tag(takes_context=True)
 def get_autofill_pages(context):
     autofill_block = context['self']
-    links=[]
+    menu = context.get('menu')
 
     try:
-        authenticated = context['request'].user.is_authenticated
+        request = context['request']
+        authenticated = request.user.is_authenticated
+        request_path = request.path
     except: # 500 error has no request
+        request = None
         authenticated = False
+        request_path = None
 
-    parent_page = autofill_block['parent_page']
-    if not parent_page:
-        return []
-    else:
-        parent_page = parent_page.localized
-
-    # include parent page if selected and if matches restriction (just assume exists=private here)
-    if autofill_block['include_parent_page']:
-        if parent_page.url == context['request'].path:
-            parent_page.active = 'active'
-        if parent_page.get_view_restrictions().exists():
-            if authenticated:
-                links.append(parent_page)
-        else:
-            links.append(parent_page)
-    
-    # return only public pages if user not authenticated
-    if authenticated:
-        children = parent_page.get_children().live().order_by(autofill_block['order_by'])
+    if menu and 'autofill_index' in autofill_block:
+        # all autofill blocks of the menu are resolved together, once per request
+        menu_links = getattr(request, '_menu_autofill_links', {})
+        key = (menu.get('cache_key') or id(menu), authenticated)
+        if key not in menu_links:
+            menu_links[key] = get_autofill_links(menu, authenticated)
+            if request is not None:
+                request._menu_autofill_links = menu_links
+        links = menu_links[key][autofill_block['autofill_index']]
     else:
-        children = parent_page.get_children().live().public().order_by(autofill_block['order_by'])
-
-    # filter by 'Show in Menus' if selected
-    if autofill_block['only_show_in_menus']:
-        children = children.filter(show_in_menus=True)
-
-    for child in children[:autofill_block['max_items']]:
-        if child.url == context['request'].path:
-            child.active = 'active'
-        links.append(child)
+        links = resolve_autofill_links([autofill_block], authenticated)[0]
 
-    return links
+    return [{**link, 'active': 'active' if link['url'] == request_path else ''} for link in links]
 
 @register.simple_tag(takes_context=True)
 def render_user_info(context, msg):
@@ -0,0 +1,8 @@
+from django.apps import AppConfig
+
+
+class ProductConfig(AppConfig):
+    name = "product"
+
+    def ready(self):
+        from . import signals  # noqa: F401
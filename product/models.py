@@ -6,14 +6,17 @@ from modelcluster.models import ClusterableModel
 from wagtail.admin.panels import FieldPanel, InlinePanel, MultiFieldPanel
 from wagtail.contrib.routable_page.models import RoutablePageMixin, path
 from wagtail.fields import RichTextField
-from wagtail.models import (DraftStateMixin, Locale, LockableMixin, Orderable,
-                            Page, PreviewableMixin, RevisionMixin,
+from wagtail.models import (DraftStateMixin, LockableMixin, Orderable, Page,
+                            PreviewableMixin, RevisionMixin,
                             TranslatableMixin, WorkflowMixin)
 from wagtail.snippets.models import register_snippet
 from wagtail_localize.fields import TranslatableField
 
+from core.locales import get_active_locale
 from core.translations import TranslatablePageMixin
 
+from .registry import get_product_registry
+
 
 @register_snippet
 class StoreDepartment(ClusterableModel):
@@ -148,7 +151,7 @@ class ProductPage(TranslatablePageMixin, RoutablePageMixin, Page):
 
     @path("")
     def product_list(self, request):
-        products = Product.objects.filter(locale_id=Locale.get_active().id, live=True)
+        products = Product.objects.filter(locale_id=get_active_locale().id, live=True)
         return self.render(
             request,
             context_overrides={
@@ -159,27 +162,27 @@ class ProductPage(TranslatablePageMixin, RoutablePageMixin, Page):
 
     @path("<str:sku>/")
     def product_detail(self, request, sku):
-        active_locale = Locale.get_active()
+        active_locale = get_active_locale()
+        registry = get_product_registry(active_locale.id)
         # only show live products
-        products = Product.objects.filter(sku=sku, live=True)
-        if products and products.filter(locale_id=active_locale.id):
+        if registry.is_live(sku):
             # if live product in active locale
             return self.render(
                 request,
                 context_overrides={
-                    "product": products.first().localized,
+                    "product": Product.objects.filter(sku=sku, locale_id=active_locale.id, live=True).first(),
                 },
                 template="product/product_detail.html",
             )
         else:
             # live product not in active locale
-            if products:
+            try:
                 # product matching sku and live in other locales, try to find product in current locale
                 # redirect request to product if found and if live else send request to product list instead
-                translated = products.first().get_translation_or_none(active_locale)
-                return HttpResponseRedirect(self.url + (translated.sku if (translated and translated.live) else ''))
-            # no live products matching that sku in this locale, redirect to product list instead
-            return HttpResponseRedirect(self.url)
+                return HttpResponseRedirect(self.url + (registry.translated_sku(sku) or ''))
+            except KeyError:
+                # no live products matching that sku in this locale, redirect to product list instead
+                return HttpResponseRedirect(self.url)
 
     @property
     def preview(self):
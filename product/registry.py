@@ -0,0 +1,97 @@
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core.locales import get_active_locale
+
+PRODUCT_REGISTRY_VERSION_KEY = "product.registry"
+# registries held in process, keyed by (version, locale id)
+PRODUCT_REGISTRY_SIZE = 32
+_registries = {}
+
+
+class ProductUrlRegistry:
+    """
+    Product detail urls for one locale, keyed by SKU.
+    Built from a single query over all products (sku, translation_key, locale, live) plus the localized ProductPage.
+    Any locale's SKU maps to the url of its live translation in this locale (falling back to the product itself),
+    as LinkValue.url() and ProductPage.product_detail resolve them.
+    """
+    def __init__(self, base_page, products, locale_id):
+        self.base_page = base_page
+        self.locale_id = locale_id
+        self._urls = {}
+        # translation_key -> (sku, live) of the product in this locale
+        localized = {
+            translation_key: (sku, live)
+            for sku, translation_key, product_locale_id, live in products
+            if product_locale_id == locale_id
+        }
+        self.live_skus = {sku for sku, live in localized.values() if live}
+        # sku in any locale -> sku to use in this locale (the first product with a sku wins, as .first() did)
+        self.localized_skus = {}
+        # sku of a live product in any locale -> sku of its live translation in this locale (or None)
+        self.translated_skus = {}
+        for sku, translation_key, product_locale_id, live in products:
+            translation = localized.get(translation_key)
+            self.localized_skus.setdefault(sku, translation[0] if translation and translation[1] else sku)
+            if live:
+                self.translated_skus.setdefault(sku, translation[0] if translation and translation[1] else None)
+
+    def detail_url(self, sku):
+        """Url of the product detail view for a SKU in this locale"""
+        if sku not in self._urls:
+            self._urls[sku] = f"{self.base_page.url}{self.base_page.reverse_subpage(name='product_detail', kwargs={'sku': sku})}"
+        return self._urls[sku]
+
+    def url(self, sku):
+        """Detail url of the product with this SKU (in any locale), localized. '' if unknown or there is no product page"""
+        localized_sku = self.localized_skus.get(sku)
+        if localized_sku is None or not self.base_page:
+            return ''
+        return self.detail_url(localized_sku)
+
+    def is_live(self, sku):
+        """True if a live product has this SKU in this locale"""
+        return sku in self.live_skus
+
+    def translated_sku(self, sku):
+        """
+        For a SKU live in any locale, the SKU of its live translation in this locale (None if there is none).
+        Raises KeyError if no live product has the SKU.
+        """
+        return self.translated_skus[sku]
+
+
+def build_product_registry(locale_id):
+    from .models import Product, ProductPage
+
+    base_page = ProductPage.objects.first()
+    if base_page and getattr(settings, "WAGTAIL_I18N_ENABLED", False):
+        base_page = (
+            ProductPage.objects.live()
+            .filter(translation_key=base_page.translation_key, locale_id=locale_id)
+            .first()
+        ) or base_page
+    products = list(
+        Product.objects.order_by("pk").values_list("sku", "translation_key", "locale_id", "live")
+    )
+    return ProductUrlRegistry(base_page, products, locale_id)
+
+def get_product_registry(locale_id=None):
+    """Product url registry for locale_id (default active locale), built on first use in each process"""
+    if locale_id is None:
+        locale_id = get_active_locale().pk
+    key = (cache.get_or_set(PRODUCT_REGISTRY_VERSION_KEY, lambda: uuid4().hex, None), locale_id)
+    registry = _registries.get(key)
+    if registry is None:
+        if len(_registries) >= PRODUCT_REGISTRY_SIZE:
+            _registries.clear()
+        registry = _registries[key] = build_product_registry(locale_id)
+    return registry
+
+def invalidate_product_registry():
+    """Drop the registries in this and (via the shared version) every other process, call when products change"""
+    _registries.clear()
+    cache.set(PRODUCT_REGISTRY_VERSION_KEY, uuid4().hex, None)
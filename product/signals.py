@@ -0,0 +1,24 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from wagtail.signals import (page_published, page_slug_changed,
+                             page_unpublished, post_page_move)
+
+from .models import Product, ProductPage
+from .registry import invalidate_product_registry
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def clear_product_registry(sender, instance, **kwargs):
+    # saving covers publish/unpublish as well as sku edits
+    invalidate_product_registry()
+
+
+@receiver(page_published, sender=ProductPage)
+@receiver(page_unpublished, sender=ProductPage)
+@receiver(post_page_move, sender=ProductPage)
+@receiver(page_slug_changed, sender=ProductPage)
+@receiver(post_delete, sender=ProductPage)
+def clear_product_registry_base_page(sender, instance, **kwargs):
+    # product urls are built on the product page url
+    invalidate_product_registry()
@@ -1,5 +1,6 @@
 from django import template
-from wagtail.models import Locale
+
+from core.locales import get_active_locale, get_all_locales
 
 register = template.Library()
 
@@ -9,9 +10,9 @@ def get_alternates(context):
     product = context.get('product')
 
     alternates = []
-    active_locale = Locale.get_active()
+    active_locale = get_active_locale()
 
-    for locale in Locale.objects.all():
+    for locale in get_all_locales():
         if locale != active_locale and product:
             trans_page = page.get_translation(locale)
             subpage = trans_page.reverse_subpage('product_detail', kwargs={'sku': product.sku})
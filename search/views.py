@@ -2,9 +2,11 @@ from django.conf import settings
 from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
 from django.template.response import TemplateResponse
 from wagtail.contrib.search_promotions.models import Query
-from wagtail.models import Locale, Page
+from wagtail.models import Page
 from wagtail.search.backends import get_search_backend
 
+from core.locales import get_active_locale
+
 backends = list(settings.WAGTAILSEARCH_BACKENDS.keys())
 
 def search(request):
@@ -13,7 +15,7 @@ def search(request):
 
     # Search
     if search_query:
-        locale=Locale.get_active()
+        locale=get_active_locale()
         scope = Page.objects.live().defer_streamfields().filter(locale=locale)
         backend = get_search_backend(locale.language_code if locale.language_code in backends else 'default')
         search_results = backend.search(search_query, scope)
@@ -5,7 +5,8 @@ from django.urls import include, path, re_path
 from wagtail import urls as wagtail_urls
 from wagtail.admin import urls as wagtailadmin_urls
 from wagtail.documents import urls as wagtaildocs_urls
-from core.views import sitemap
+from blocks.views import csv_table_rows
+from core.views import sitemap, sitemap_index, sitemap_shard
 from search import views as search_views
 from language_switcher.views import set_language_from_url
 
@@ -14,7 +15,10 @@ urlpatterns = [
     path("admin/", include(wagtailadmin_urls)),
     path("documents/", include(wagtaildocs_urls)),
     re_path(r'^sitemap.xml$', sitemap, name='sitemap'),
+    re_path(r'^sitemap-index.xml$', sitemap_index, name='sitemap_index'),
+    re_path(r'^(?P<filename>[\w-]+\.[\w-]+\.\d+\.xml)$', sitemap_shard, name='sitemap_shard'),
     path('lang/<str:language_code>/', set_language_from_url, name='set_language_from_url'),
+    path('csv-table/<int:page_id>/<str:key>/rows/', csv_table_rows, name='csv_table_rows'),
 ]
 
 